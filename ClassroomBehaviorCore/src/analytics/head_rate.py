@@ -1,10 +1,12 @@
-from collections import deque
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Any
 
 import cv2
 import numpy as np
 
+from .smoothing import RollingMean
+
 
 class HeadUpRateAnalyzer:
     def __init__(
@@ -12,50 +14,134 @@ class HeadUpRateAnalyzer:
         window_size: int = 15,
         head_region_ratio: float = 0.2,
         brightness_threshold: float = 0.35,
+        use_integral: bool = False,
+        smoothing: str = "window",
     ) -> None:
         self.window_size = window_size
         self.head_region_ratio = head_region_ratio
         self.brightness_threshold = brightness_threshold
-        self._history = deque(maxlen=window_size)
+        # Summed-area table of V per frame: O(1) mean per head region.
+        self.use_integral = use_integral
+        self.smoothing = smoothing
+        self._history = RollingMean(window_size, smoothing)
+
+    @staticmethod
+    def person_boxes(detections: Sequence[dict[str, Any]]) -> np.ndarray:
+        """Return the (N, 4) xyxy boxes of person detections."""
+        boxes = getattr(detections, "boxes", None)
+        if isinstance(boxes, np.ndarray):
+            cls_ids = detections.cls_ids
+            person_ids = [
+                c
+                for c in np.unique(cls_ids).tolist()
+                if c == 0 or detections.class_name(c) == "person"
+            ]
+            return boxes[np.isin(cls_ids, person_ids)]
+        persons = [
+            d["xyxy"]
+            for d in detections
+            if d.get("name") == "person" or d.get("cls") == 0
+        ]
+        return np.asarray(persons, dtype=np.int64).reshape(-1, 4)
+
+    def _head_boxes(self, shape: tuple[int, ...], boxes: np.ndarray) -> np.ndarray:
+        """Head regions (top `head_region_ratio` of each box), clipped to the frame."""
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        h_img, w_img = shape[:2]
+        x1, y1, x2, y2 = boxes.T
+        head_h = np.maximum(
+            1, (np.maximum(1, y2 - y1) * self.head_region_ratio).astype(np.int64)
+        )
+        heads = np.stack([x1, y1, x2, y1 + head_h], axis=1)
+        heads[:, 0::2] = np.clip(heads[:, 0::2], 0, w_img)
+        heads[:, 1::2] = np.clip(heads[:, 1::2], 0, h_img)
+        return heads
+
+    @staticmethod
+    def _value_channel(img_rgb: np.ndarray) -> np.ndarray:
+        """HSV V of an image or crop: max over RGB, identical to cv2's uint8 V."""
+        if img_rgb.ndim == 2:
+            return img_rgb
+        return np.maximum(
+            np.maximum(img_rgb[:, :, 0], img_rgb[:, :, 1]), img_rgb[:, :, 2]
+        )
+
+    @classmethod
+    def _region_means_integral(
+        cls, img_rgb: np.ndarray, regions: np.ndarray
+    ) -> np.ndarray:
+        # Only the bounding rectangle of all regions needs V and a table.
+        ox, oy = regions[:, 0].min(), regions[:, 1].min()
+        v = cls._value_channel(
+            img_rgb[oy : regions[:, 3].max(), ox : regions[:, 2].max()]
+        )
+        # int32 sums are exact for uint8 frames up to 4K; wider needs float64.
+        exact_int = v.dtype == np.uint8 and v.size * 255 < np.iinfo(np.int32).max
+        sat = cv2.integral(v, sdepth=cv2.CV_32S if exact_int else cv2.CV_64F)
+        x1, y1, x2, y2 = (regions - [ox, oy, ox, oy]).T
+        sums = sat[y2, x2].astype(np.float64) - sat[y1, x2] - sat[y2, x1] + sat[y1, x1]
+        return sums / ((x2 - x1) * (y2 - y1))
+
+    def classify_heads(self, img_rgb: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """
+        Classify every person box of a frame at once.
+
+        The HSV V channel (max over RGB) is computed only inside the head
+        regions and their means are thresholded in a single pass. With
+        `use_integral` the means come from a summed-area table over the
+        bounding rectangle of the head regions instead of per-region slices.
+        Returns an (N,) array of "up", "down" or "unknown".
+        """
+        heads = self._head_boxes(img_rgb.shape, boxes)
+        labels = np.full(len(heads), "unknown", dtype=object)
+        valid = (heads[:, 2] > heads[:, 0]) & (heads[:, 3] > heads[:, 1])
+        if not valid.any():
+            # No box or every head region is empty / off-frame.
+            return labels
+        if self.use_integral:
+            scores = self._region_means_integral(img_rgb, heads[valid])
+        else:
+            scores = np.array(
+                [
+                    self._value_channel(img_rgb[y1:y2, x1:x2]).mean()
+                    for x1, y1, x2, y2 in heads[valid].tolist()
+                ],
+                dtype=np.float64,
+            ).reshape(-1)
+        labels[valid] = np.where(
+            scores / 255.0 >= self.brightness_threshold, "up", "down"
+        )
+        return labels
 
     def _classify_head(self, img_rgb: np.ndarray, person_box: list[int]) -> str:
-        x1, y1, x2, y2 = person_box
-        h = max(1, y2 - y1)
-        head_h = max(1, int(h * self.head_region_ratio))
-        hx1, hy1, hx2, hy2 = x1, y1, x2, y1 + head_h
-        roi = img_rgb[hy1:hy2, hx1:hx2]
-        if roi.size == 0:
-            return "unknown"
-        hsv = cv2.cvtColor(roi, cv2.COLOR_RGB2HSV)
-        v = hsv[:, :, 2].astype(np.float32) / 255.0
-        score = float(v.mean())
-        return "up" if score >= self.brightness_threshold else "down"
+        return str(self.classify_heads(img_rgb, np.asarray([person_box]))[0])
 
     def analyze_frame(
-        self, img_rgb: np.ndarray, detections: list[dict[str, Any]]
+        self,
+        img_rgb: np.ndarray,
+        detections: Sequence[dict[str, Any]],
+        head_labels: np.ndarray | None = None,
     ) -> dict[str, Any]:
-        persons = [
-            d for d in detections if d.get("name") == "person" or d.get("cls") == 0
-        ]
-        head_up = 0
-        head_down = 0
-        for p in persons:
-            cls = self._classify_head(img_rgb, p["xyxy"])
-            if cls == "up":
-                head_up += 1
-            elif cls == "down":
-                head_down += 1
-        total = max(1, len(persons))
+        """
+        Aggregate head-up statistics for one frame.
+
+        `head_labels` may carry labels already produced by `classify_heads`
+        for this frame's persons, in which case no classification is redone.
+        """
+        if head_labels is None:
+            head_labels = self.classify_heads(img_rgb, self.person_boxes(detections))
+        n_persons = len(head_labels)
+        head_up = int(np.count_nonzero(head_labels == "up"))
+        head_down = int(np.count_nonzero(head_labels == "down"))
+        total = max(1, n_persons)
         rate = head_up / total
-        self._history.append(rate)
+        smooth = self._history.update(rate)
         return {
-            "persons": len(persons),
+            "persons": n_persons,
             "head_up": head_up,
             "head_down": head_down,
             "head_up_rate": rate,
-            "head_up_rate_smooth": (
-                float(np.mean(self._history)) if self._history else rate
-            ),
+            "head_up_rate_smooth": smooth,
         }
 
     @staticmethod
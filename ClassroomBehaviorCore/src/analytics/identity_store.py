@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Any
+
+from .smoothing import RollingMean
+
+
+class IdentityStore:
+    """
+    Per-identity smoothers with bounded size.
+
+    Entries are kept in recency order. An identity not seen for more than
+    `ttl_frames` frames is dropped (TTL), and when more than `max_identities`
+    are held the least recently seen one is dropped (LRU). Either bound can
+    be disabled with None.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 15,
+        smoothing: str = "window",
+        ttl_frames: int | None = 300,
+        max_identities: int | None = 1000,
+    ) -> None:
+        self.window_size = window_size
+        self.smoothing = smoothing
+        self.ttl_frames = ttl_frames
+        self.max_identities = max_identities
+        self._entries: OrderedDict[str, tuple[RollingMean, int]] = OrderedDict()
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+
+    def get(self, identity: str, frame_id: int) -> RollingMean:
+        """Return the smoother for `identity`, marking it seen at `frame_id`."""
+        entry = self._entries.pop(identity, None)
+        smoother = (
+            entry[0]
+            if entry is not None
+            else RollingMean(self.window_size, self.smoothing)
+        )
+        self._entries[identity] = (smoother, frame_id)
+        if self.max_identities is not None:
+            while len(self._entries) > self.max_identities:
+                self._entries.popitem(last=False)
+                self.evicted_lru += 1
+        return smoother
+
+    def evict(self, frame_id: int) -> int:
+        """Drop identities not seen within `ttl_frames`; return how many."""
+        if self.ttl_frames is None:
+            return 0
+        dropped = 0
+        while self._entries:
+            _, (_, last_seen) = next(iter(self._entries.items()))
+            if frame_id - last_seen <= self.ttl_frames:
+                break
+            self._entries.popitem(last=False)
+            dropped += 1
+        self.evicted_ttl += dropped
+        return dropped
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, identity: object) -> bool:
+        return identity in self._entries
+
+    def __getitem__(self, identity: str) -> RollingMean:
+        return self._entries[identity][0]
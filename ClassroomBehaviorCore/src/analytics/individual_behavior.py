@@ -1,4 +1,4 @@
-from collections import defaultdict, deque
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Any
 
@@ -6,9 +6,23 @@ import numpy as np
 
 from ..services.face_ops import FacePipeline
 from .head_rate import HeadUpRateAnalyzer
+from .identity_store import IdentityStore
+from .tracker import IoUTracker
 
 
 class IndividualBehaviorAnalyzer:
+    """
+    Per-person head-up analysis with optional face identities.
+
+    Set `video` when the frames passed to `analyze_frame` are consecutive
+    frames of one video or stream. Only then are boxes tracked across frames
+    (`enable_tracking`) and face results cached; still images are analysed
+    independently, so ids and names never carry over between photos.
+
+    `face_pipeline` shares an already loaded `FacePipeline` (its identity
+    cache is reset) instead of building one from the `face_*` arguments.
+    """
+
     def __init__(
         self,
         window_size: int = 15,
@@ -18,54 +32,114 @@ class IndividualBehaviorAnalyzer:
         face_model_path: Path = Path("output/face_lbph.xml"),
         face_labels_path: Path = Path("output/face_labels.json"),
         unknown_threshold: float = 60.0,
+        face_reverify_interval: int = 30,
+        face_head_only: bool = False,
+        face_detect_max_side: int | None = None,
+        face_frame_level: bool = True,
+        face_frame_max_side: int | None = None,
+        face_backend: str = "lbph",
         enable_face: bool = True,
+        use_integral: bool = False,
+        smoothing: str = "window",
+        identity_ttl: int | None = 300,
+        max_identities: int | None = 1000,
+        enable_tracking: bool = True,
+        video: bool = False,
+        track_iou: float = 0.3,
+        track_max_age: int = 30,
+        face_pipeline: FacePipeline | None = None,
     ) -> None:
         self.overall = HeadUpRateAnalyzer(
-            window_size, head_region_ratio, brightness_threshold
+            window_size,
+            head_region_ratio,
+            brightness_threshold,
+            use_integral,
+            smoothing,
         )
-        self.face = (
-            FacePipeline(
+        self.face: FacePipeline | None = None
+        if enable_face and face_pipeline is not None:
+            face_pipeline.reset_cache()
+            self.face = face_pipeline
+        elif enable_face:
+            self.face = FacePipeline(
                 gallery_dir=face_gallery_dir,
                 model_path=face_model_path,
                 labels_path=face_labels_path,
                 unknown_threshold=unknown_threshold,
+                reverify_interval=face_reverify_interval,
+                head_region_ratio=head_region_ratio if face_head_only else None,
+                detect_max_side=face_detect_max_side,
+                frame_max_side=face_frame_max_side,
+                backend=face_backend,
             )
-            if enable_face
-            else None
-        )
         self.enable_face = enable_face
-        self.histories: dict[str, deque] = defaultdict(
-            lambda: deque(maxlen=window_size)
+        # One cascade pass per frame shared by all persons (vs. one per person).
+        self.face_frame_level = face_frame_level
+        self.histories = IdentityStore(
+            window_size, smoothing, identity_ttl, max_identities
+        )
+        self.video = video
+        # Persistent ids across frames; face results are cached per track.
+        self.tracker = (
+            IoUTracker(track_iou, track_max_age) if video and enable_tracking else None
         )
 
+    def _assign_identities(
+        self,
+        img_rgb: np.ndarray,
+        boxes: np.ndarray,
+        track_ids: list[int | None],
+        frame_id: int,
+    ) -> list[str]:
+        names = ["Unknown"] * len(boxes)
+        if self.face and len(boxes):
+            box_list = boxes.tolist()
+            keys = [
+                t if t is not None else self.face.cache.region_key(b)
+                for t, b in zip(track_ids, box_list, strict=True)
+            ]
+            if self.face_frame_level:
+                names = self.face.assign_identities(
+                    img_rgb, boxes, keys, frame_id, use_cache=self.video
+                )
+            elif self.video:
+                names = [
+                    self.face.assign_identity_cached(img_rgb, b, k, frame_id)
+                    for b, k in zip(box_list, keys, strict=True)
+                ]
+            else:
+                names = [self.face.assign_identity(img_rgb, b) for b in box_list]
+        identities: list[str] = []
+        for idx, (name, track_id) in enumerate(zip(names, track_ids, strict=True)):
+            if name != "Unknown":
+                identities.append(name)
+            elif track_id is not None:
+                identities.append(f"Unknown_T{track_id}")
+            else:
+                identities.append(f"Unknown_{frame_id}_{idx}")
+        return identities
+
     def analyze_frame(
-        self, img_rgb: np.ndarray, detections: list[dict[str, Any]], frame_id: int
+        self, img_rgb: np.ndarray, detections: Sequence[dict[str, Any]], frame_id: int
     ) -> dict[str, Any]:
-        persons = [
-            d for d in detections if d.get("name") == "person" or d.get("cls") == 0
-        ]
+        boxes = self.overall.person_boxes(detections)
+        head_labels = self.overall.classify_heads(img_rgb, boxes)
+        track_ids: list[int | None] = [None] * len(boxes)
+        if self.tracker is not None:
+            track_ids = self.tracker.update(boxes).tolist()
+        identities = self._assign_identities(img_rgb, boxes, track_ids, frame_id)
         records: list[dict[str, Any]] = []
 
-        for idx, p in enumerate(persons):
-            box = p["xyxy"]
-            head_cls = self.overall._classify_head(img_rgb, box)
-            if not self.face:
-                identity = f"Unknown_{frame_id}_{idx}"
-            else:
-                identity = self.face.assign_identity(img_rgb, box)
-                if identity == "Unknown":
-                    identity = f"Unknown_{frame_id}_{idx}"
+        for box, head_cls, track_id, identity in zip(
+            boxes.tolist(), head_labels.tolist(), track_ids, identities, strict=True
+        ):
             rate = 1.0 if head_cls == "up" else 0.0
-            self.histories[identity].append(rate)
-            smooth = (
-                float(np.mean(self.histories[identity]))
-                if self.histories[identity]
-                else rate
-            )
+            smooth = self.histories.get(identity, frame_id).update(rate)
             records.append(
                 {
                     "frame": frame_id,
                     "id": identity,
+                    "track_id": track_id,
                     "head": head_cls,
                     "head_up_rate": rate,
                     "head_up_rate_smooth": smooth,
@@ -73,12 +147,19 @@ class IndividualBehaviorAnalyzer:
                 }
             )
 
-        overall_stats = self.overall.analyze_frame(img_rgb, detections)
+        overall_stats = self.overall.analyze_frame(
+            img_rgb, detections, head_labels=head_labels
+        )
+        self.histories.evict(frame_id)
+        if self.face:
+            self.face.cache.prune(frame_id)
         return {
             "frame": frame_id,
             "overall": overall_stats,
             "individuals": records,
             "identities_count": len(self.histories),
+            "identity_store": self.histories.stats(),
+            "face_cache": self.face.cache.stats() if self.face else None,
         }
 
     @staticmethod
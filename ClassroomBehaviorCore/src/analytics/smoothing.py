@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class RollingMean:
+    """
+    O(1) smoother for a stream of rates.
+
+    - mode="window": mean of the last `window_size` values, kept as a running
+      sum over a fixed numpy ring buffer.
+    - mode="ema": exponential moving average with `alpha` (defaults to
+      2 / (window_size + 1)); no buffer at all.
+    """
+
+    MODES = ("window", "ema")
+
+    def __init__(
+        self, window_size: int = 15, mode: str = "window", alpha: float | None = None
+    ) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown smoothing mode: {mode!r}")
+        self.window_size = max(1, int(window_size))
+        self.mode = mode
+        self.alpha = alpha if alpha is not None else 2.0 / (self.window_size + 1)
+        self._buf = np.zeros(self.window_size) if mode == "window" else None
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._value = 0.0
+
+    def update(self, x: float) -> float:
+        """Add one value and return the smoothed rate."""
+        x = float(x)
+        if self._buf is None:
+            if self._count == 0:
+                self._value = x
+            else:
+                self._value += self.alpha * (x - self._value)
+            self._count += 1
+            return self._value
+
+        self._sum += x - float(self._buf[self._pos])
+        self._buf[self._pos] = x
+        self._pos += 1
+        if self._pos == self.window_size:
+            self._pos = 0
+            # Re-anchor once per wrap so float drift cannot accumulate.
+            self._sum = float(self._buf.sum())
+        self._count = min(self._count + 1, self.window_size)
+        self._value = self._sum / self._count
+        return self._value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def __len__(self) -> int:
+        return self._count
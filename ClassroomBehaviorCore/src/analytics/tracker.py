@@ -0,0 +1,114 @@
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (M, 4) and (N, 4) xyxy boxes."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_match(scores: np.ndarray, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """Match rows to columns by descending score; returns (rows, cols)."""
+    rows, cols = np.nonzero(scores >= threshold)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+    used_r: set[int] = set()
+    used_c: set[int] = set()
+    keep_r: list[int] = []
+    keep_c: list[int] = []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist(), strict=True):
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        keep_r.append(r)
+        keep_c.append(c)
+    return np.asarray(keep_r, dtype=np.int64), np.asarray(keep_c, dtype=np.int64)
+
+
+class IoUTracker:
+    """
+    Lightweight SORT-style tracker.
+
+    Tracks carry a box and a per-coordinate velocity (per frame); each update
+    they are advanced by their velocity and greedily matched to detections by
+    IoU. Tracks unmatched for more than `max_age` updates are dropped.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30) -> None:
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._next_id = 1
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._boxes = np.zeros((0, 4), dtype=np.float64)
+        self._vel = np.zeros((0, 4), dtype=np.float64)
+        self._missed = np.zeros(0, dtype=np.int64)
+
+    def update(self, boxes: np.ndarray, dt: int = 1) -> np.ndarray:
+        """
+        Associate this frame's (N, 4) boxes with tracks; returns (N,) ids.
+
+        `dt` is the number of frames since the previous update, for callers
+        that do not run detection on every frame.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        dt = max(1, int(dt))
+        predicted = self._boxes + self._vel * dt
+        rows, cols = greedy_match(iou_matrix(predicted, boxes), self.iou_threshold)
+
+        out = np.zeros(len(boxes), dtype=np.int64)
+        out[cols] = self._ids[rows]
+        self._vel[rows] = 0.5 * self._vel[rows] + 0.5 * (
+            (boxes[cols] - self._boxes[rows]) / dt
+        )
+        self._boxes = predicted
+        self._boxes[rows] = boxes[cols]
+        self._missed += 1
+        self._missed[rows] = 0
+
+        alive = self._missed <= self.max_age
+        self._ids = self._ids[alive]
+        self._boxes = self._boxes[alive]
+        self._vel = self._vel[alive]
+        self._missed = self._missed[alive]
+
+        new = np.ones(len(boxes), dtype=bool)
+        new[cols] = False
+        n_new = int(new.sum())
+        if n_new:
+            new_ids = np.arange(self._next_id, self._next_id + n_new)
+            self._next_id += n_new
+            out[new] = new_ids
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._boxes = np.concatenate([self._boxes, boxes[new]])
+            self._vel = np.concatenate([self._vel, np.zeros((n_new, 4))])
+            self._missed = np.concatenate(
+                [self._missed, np.zeros(n_new, dtype=np.int64)]
+            )
+        return out
+
+    def velocities(self, ids: np.ndarray) -> np.ndarray:
+        """Per-frame (N, 4) box velocities of `ids`; zero for unknown ids."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        out = np.zeros((len(ids), 4), dtype=np.float64)
+        if len(self._ids) == 0:
+            return out
+        # Track ids are issued in increasing order and kept sorted.
+        idx = np.minimum(np.searchsorted(self._ids, ids), len(self._ids) - 1)
+        found = self._ids[idx] == ids
+        out[found] = self._vel[idx[found]]
+        return out
+
+    def active_ids(self) -> set[int]:
+        return set(self._ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._ids)
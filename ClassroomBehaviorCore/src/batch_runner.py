@@ -0,0 +1,442 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+from src.analytics.individual_behavior import IndividualBehaviorAnalyzer
+from src.services.face_ops import FacePipeline
+from src.services.image_loader import PrefetchImageLoader
+
+APP_ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = APP_ROOT / "configs" / "config.yaml"
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+VIDEO_SUFFIXES = {".mp4", ".avi", ".mov", ".mkv"}
+CSV_COLUMNS = ["source", "frame", "id", "head", "head_up_rate", "head_up_rate_smooth"]
+
+# Per-process state set up once by `_init_worker`.
+_WORKER: dict[str, Any] = {}
+
+
+def load_config() -> dict:
+    if CONFIG_PATH.exists():
+        with open(CONFIG_PATH, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+
+def collect_files(root: Path, suffixes: set[str]) -> list[Path]:
+    if root.is_file():
+        return [root] if root.suffix.lower() in suffixes else []
+    if root.exists():
+        return sorted(p for p in root.rglob("*") if p.suffix.lower() in suffixes)
+    return []
+
+
+def build_face_pipeline(cfg: dict, sync_gallery: bool = True) -> FacePipeline:
+    a_cfg = cfg.get("analytics", {}) or {}
+    face_cfg = cfg.get("face", {}) or {}
+    head_only = bool(face_cfg.get("head_only", False))
+    return FacePipeline(
+        gallery_dir=APP_ROOT / face_cfg.get("gallery_dir", "data/face_gallery"),
+        model_path=APP_ROOT / face_cfg.get("model_path", "output/face_lbph.xml"),
+        labels_path=APP_ROOT / face_cfg.get("labels_path", "output/face_labels.json"),
+        unknown_threshold=float(face_cfg.get("unknown_threshold", 60.0)),
+        reverify_interval=int(face_cfg.get("reverify_interval", 30)),
+        head_region_ratio=(
+            float(a_cfg.get("head_region_ratio", 0.2)) if head_only else None
+        ),
+        detect_max_side=face_cfg.get("detect_max_side"),
+        frame_max_side=face_cfg.get("frame_max_side"),
+        backend=str(face_cfg.get("backend", "lbph")),
+        sync_gallery=sync_gallery,
+    )
+
+
+def build_analyzer(
+    cfg: dict, face: FacePipeline | None, video: bool = False
+) -> IndividualBehaviorAnalyzer:
+    """Fresh per-unit state around the worker's shared face pipeline."""
+    a_cfg = cfg.get("analytics", {}) or {}
+    face_cfg = cfg.get("face", {}) or {}
+    return IndividualBehaviorAnalyzer(
+        window_size=int(a_cfg.get("window_size", 15)),
+        head_region_ratio=float(a_cfg.get("head_region_ratio", 0.2)),
+        brightness_threshold=float(a_cfg.get("brightness_threshold", 0.35)),
+        face_frame_level=bool(face_cfg.get("frame_level", True)),
+        enable_face=face is not None,
+        use_integral=bool(a_cfg.get("integral_image", False)),
+        smoothing=str(a_cfg.get("smoothing", "window")),
+        identity_ttl=a_cfg.get("identity_ttl_frames", 300),
+        max_identities=a_cfg.get("max_identities", 1000),
+        enable_tracking=bool(a_cfg.get("tracking", True)),
+        video=video,
+        face_pipeline=face,
+    )
+
+
+def _init_worker(settings: dict[str, Any]) -> None:
+    """Load the detector and the face pipeline once per worker process."""
+    import cv2
+
+    threads = int(settings["threads"])
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+
+    from src.services.yolov8_inference import Yolov8Inference
+
+    inf = settings["inference"]
+    _WORKER["det"] = Yolov8Inference(
+        weights=settings["weights"],
+        device=str(inf.get("device", "")),
+        imgsz=int(inf.get("imgsz", 640)),
+        conf=float(inf.get("conf", 0.25)),
+        iou=float(inf.get("iou", 0.45)),
+        classes=[0],
+        max_det=int(inf.get("max_det", 1000)),
+        half=bool(inf.get("half", False)),
+    )
+    # The parent has already synced the gallery; workers only load the model,
+    # so they never retrain or write the model files concurrently.
+    _WORKER["face"] = (
+        build_face_pipeline(settings["config"], sync_gallery=False)
+        if settings["enable_face"]
+        else None
+    )
+    _WORKER["settings"] = settings
+
+
+def _iter_unit(unit: dict[str, Any], failed: list[dict[str, str]]):
+    """
+    Yield (source, frame_id, predict output) for every frame of a unit.
+
+    Frames stay BGR, as decoded, until the model has seen them; only the
+    `image` handed to the analyzer is converted to RGB. Images that cannot
+    be decoded and videos that cannot be opened are logged, appended to
+    `failed` and skipped instead of failing the unit.
+    """
+    import cv2
+
+    det = _WORKER["det"]
+    settings = _WORKER["settings"]
+    batch_size = int(settings["batch_size"])
+
+    def skip(item: str | Path, exc: Exception) -> None:
+        print(f"[warn] skipped {item}: {exc}")
+        failed.append({"item": str(item), "error": str(exc)})
+
+    if unit["kind"] == "video":
+        source = unit["items"][0]
+        try:
+            for frame_idx, out in det.iter_video_results(
+                source,
+                sample_stride=int(settings["sample_stride"]),
+                batch_size=batch_size,
+            ):
+                yield source, frame_idx, out
+        except FileNotFoundError as exc:
+            skip(source, exc)
+        return
+    loader = PrefetchImageLoader(
+        unit["items"],
+        prefetch=max(int(settings["prefetch"]), batch_size),
+        workers=int(settings["threads"]),
+        reduce=int(settings["reduce"]),
+        rgb=False,
+        on_error=skip,
+    )
+    frame_id = 0
+    for chunk, images in loader.batches(batch_size):
+        outs = det.predict_batch(images, batch_size=batch_size, bgr=True)
+        for source, out in zip(chunk, outs, strict=True):
+            frame_id += 1
+            out["image"] = cv2.cvtColor(out["image"], cv2.COLOR_BGR2RGB)
+            yield source, frame_id, out
+
+
+def _process_unit(unit: dict[str, Any]) -> dict[str, Any]:
+    """Run one unit in a worker; rows go to the unit's own part file."""
+    settings = _WORKER["settings"]
+    # Tracking and the face cache only make sense within one video.
+    analyzer = build_analyzer(
+        settings["config"], _WORKER["face"], video=unit["kind"] == "video"
+    )
+    part = Path(unit["part"])
+    tmp = part.with_suffix(".tmp")
+    t0 = time.perf_counter()
+    rows = frames = 0
+    failed: list[dict[str, str]] = []
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for source, frame_id, out in _iter_unit(unit, failed):
+            stats = analyzer.analyze_frame(out["image"], out["detections"], frame_id)
+            for r in stats["individuals"]:
+                writer.writerow(
+                    [source, frame_id] + [r.get(k) for k in CSV_COLUMNS[2:]]
+                )
+            rows += len(stats["individuals"])
+            frames += 1
+    os.replace(tmp, part)
+    return {
+        "items": unit["items"],
+        "part": str(part),
+        "rows": rows,
+        "frames": frames,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "pid": os.getpid(),
+    }
+
+
+class ResultAggregator:
+    """
+    Single writer for the output CSV and its progress manifest.
+
+    Workers write each finished unit to a part file; `commit` appends it to
+    the CSV, fsyncs, and then records the unit's items together with the
+    CSV size in the manifest (one JSON object per line), including the items
+    that were skipped as unreadable. On resume the CSV is truncated back to
+    the last recorded size, so a crash never leaves a half-merged unit, and
+    recorded items (skipped ones too) are not processed again.
+    """
+
+    def __init__(self, output_csv: Path, resume: bool = False) -> None:
+        self.output_csv = output_csv
+        self.manifest_path = output_csv.with_name(output_csv.name + ".progress.jsonl")
+        self.done: set[str] = set()
+        offset = 0
+        if resume and self.manifest_path.exists():
+            valid = 0
+            with open(self.manifest_path, "r+b") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line
+                    self.done.update(entry["items"])
+                    offset = int(entry["offset"])
+                    valid += len(line)
+                f.truncate(valid)
+        output_csv.parent.mkdir(parents=True, exist_ok=True)
+        if offset and output_csv.exists():
+            self._csv = open(output_csv, "r+b")
+            self._csv.truncate(offset)
+            self._csv.seek(offset)
+        else:
+            self._csv = open(output_csv, "wb")
+            self._csv.write((",".join(CSV_COLUMNS) + "\r\n").encode("utf-8"))
+            self.done.clear()
+            if self.manifest_path.exists():
+                self.manifest_path.unlink()
+        self._manifest = open(self.manifest_path, "a", encoding="utf-8")
+
+    def commit(self, result: dict[str, Any]) -> None:
+        part = Path(result["part"])
+        with open(part, "rb") as f:
+            while chunk := f.read(1 << 20):
+                self._csv.write(chunk)
+        self._csv.flush()
+        os.fsync(self._csv.fileno())
+        entry = {
+            "items": result["items"],
+            "offset": self._csv.tell(),
+            "rows": result["rows"],
+            "frames": result["frames"],
+            "failed": result["failed"],
+        }
+        self._manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._manifest.flush()
+        os.fsync(self._manifest.fileno())
+        self.done.update(result["items"])
+        part.unlink()
+
+    def close(self) -> None:
+        self._csv.close()
+        self._manifest.close()
+
+
+def make_units(
+    images: list[Path], videos: list[Path], done: set[str], shard_size: int
+) -> list[dict[str, Any]]:
+    """Whole videos (tracking state is per video) and shards of images."""
+    units: list[dict[str, Any]] = [
+        {"kind": "video", "items": [str(v)]} for v in videos if str(v) not in done
+    ]
+    todo = [str(p) for p in images if str(p) not in done]
+    shard_size = max(1, shard_size)
+    units += [
+        {"kind": "images", "items": todo[i : i + shard_size]}
+        for i in range(0, len(todo), shard_size)
+    ]
+    return units
+
+
+def run_batch(
+    units: list[dict[str, Any]],
+    settings: dict[str, Any],
+    aggregator: ResultAggregator,
+    workers: int,
+) -> dict[str, int]:
+    parts_dir = aggregator.output_csv.with_name(aggregator.output_csv.name + ".parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    for unit in units:
+        digest = hashlib.sha1("\n".join(unit["items"]).encode("utf-8")).hexdigest()
+        unit["part"] = str(parts_dir / f"{digest}.csv")
+
+    totals = {"units": 0, "frames": 0, "rows": 0, "skipped": 0}
+    errors: list[str] = []
+    # spawn: CUDA and most model runtimes are not fork-safe.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(settings,),
+    ) as pool:
+        futures = {pool.submit(_process_unit, unit): unit for unit in units}
+        for fut in as_completed(futures):
+            try:
+                result = fut.result()
+            except Exception as exc:
+                # Keep committing the other units; this one is retried on resume.
+                unit = futures[fut]
+                errors.append(f"{unit['items'][0]} (+{len(unit['items']) - 1}): {exc}")
+                print(f"[error] unit failed: {errors[-1]}")
+                continue
+            aggregator.commit(result)
+            totals["units"] += 1
+            totals["frames"] += result["frames"]
+            totals["rows"] += result["rows"]
+            totals["skipped"] += len(result["failed"])
+            print(
+                f"[{totals['units']}/{len(units)}] {len(result['items'])} item(s), "
+                f"{result['frames']} frames in {result['seconds']:.1f}s (pid {result['pid']})"
+            )
+    if errors:
+        raise RuntimeError(
+            f"{len(errors)} unit(s) failed; the others were saved, "
+            "rerun with --resume to retry: " + "; ".join(errors)
+        )
+    return totals
+
+
+def main():
+    cfg = load_config()
+    inf_cfg = cfg.get("inference", {}) or {}
+
+    parser = argparse.ArgumentParser(
+        description="Headless batch identity behavior analysis over many images/videos"
+    )
+    parser.add_argument("--images_dir", type=str, default="")
+    parser.add_argument(
+        "--videos", type=str, nargs="*", default=[], help="Video files or directories"
+    )
+    parser.add_argument(
+        "--weights", type=str, default=str(inf_cfg.get("weights", "yolov8n.pt"))
+    )
+    parser.add_argument(
+        "--output_csv", type=str, default=str(APP_ROOT / "output" / "batch.csv")
+    )
+    parser.add_argument(
+        "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2)
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=0,
+        help="Intra-op threads per worker (0: cpu_count / workers)",
+    )
+    parser.add_argument(
+        "--shard_size", type=int, default=64, help="Images per work unit"
+    )
+    parser.add_argument(
+        "--batch_size", type=int, default=8, help="Frames per forward pass"
+    )
+    parser.add_argument("--sample_stride", type=int, default=1)
+    parser.add_argument(
+        "--prefetch", type=int, default=16, help="Images decoded ahead per worker"
+    )
+    parser.add_argument(
+        "--reduce",
+        type=int,
+        default=1,
+        choices=[1, 2, 4, 8],
+        help="Decode images at 1/N resolution",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip items recorded in the progress manifest of --output_csv",
+    )
+    parser.add_argument(
+        "--no_face",
+        action="store_true",
+        help="Disable face recognition and use anonymous IDs",
+    )
+    args = parser.parse_args()
+
+    images = (
+        collect_files(Path(args.images_dir), IMAGE_SUFFIXES) if args.images_dir else []
+    )
+    videos = [
+        v for src in args.videos for v in collect_files(Path(src), VIDEO_SUFFIXES)
+    ]
+    if not images and not videos:
+        print("[error] No images or videos to process.")
+        return
+
+    if not args.no_face:
+        # Train/sync the face model once here so workers only load it.
+        build_face_pipeline(cfg)
+
+    workers = max(1, args.workers)
+    settings = {
+        "config": cfg,
+        "inference": inf_cfg,
+        "weights": args.weights,
+        "enable_face": not args.no_face,
+        "batch_size": max(1, args.batch_size),
+        "sample_stride": max(1, args.sample_stride),
+        "prefetch": args.prefetch,
+        "reduce": args.reduce,
+        "threads": args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers),
+    }
+
+    aggregator = ResultAggregator(Path(args.output_csv), resume=args.resume)
+    try:
+        units = make_units(images, videos, aggregator.done, args.shard_size)
+        if not units:
+            print("Nothing to do: all items are already recorded as done.")
+            return
+        print(
+            f"{len(units)} units ({len(images)} images, {len(videos)} videos), "
+            f"{len(aggregator.done)} items already done, {workers} workers"
+        )
+        totals = run_batch(units, settings, aggregator, workers)
+    finally:
+        aggregator.close()
+    print(
+        f"Processed {totals['units']} units, {totals['frames']} frames, "
+        f"{totals['rows']} rows -> {args.output_csv}"
+        + (
+            f", {totals['skipped']} unreadable item(s) skipped"
+            if totals["skipped"]
+            else ""
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
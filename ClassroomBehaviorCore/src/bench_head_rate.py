@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.analytics.head_rate import HeadUpRateAnalyzer
+
+
+def random_boxes(
+    rng: np.random.Generator, n: int, width: int, height: int
+) -> np.ndarray:
+    w = rng.integers(40, 160, n)
+    h = rng.integers(80, 320, n)
+    x1 = rng.integers(0, width - 160, n)
+    y1 = rng.integers(0, height - 320, n)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def baseline_classify(
+    analyzer: HeadUpRateAnalyzer, img: np.ndarray, boxes: np.ndarray
+) -> np.ndarray:
+    """The original per-person loop: HSV conversion of each head crop."""
+    labels = []
+    for x1, y1, x2, y2 in boxes.tolist():
+        head_h = max(1, int(max(1, y2 - y1) * analyzer.head_region_ratio))
+        roi = img[y1 : y1 + head_h, x1:x2]
+        if roi.size == 0:
+            labels.append("unknown")
+            continue
+        v = cv2.cvtColor(roi, cv2.COLOR_RGB2HSV)[:, :, 2].astype(np.float32) / 255.0
+        labels.append("up" if v.mean() >= analyzer.brightness_threshold else "down")
+    return np.array(labels, dtype=object)
+
+
+def time_call(repeat: int, fn, *args) -> float:
+    fn(*args)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark head brightness classification: per-person baseline vs "
+            "ROI slices vs integral image"
+        )
+    )
+    parser.add_argument("--persons", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    img = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    slices = HeadUpRateAnalyzer(use_integral=False)
+    integral = HeadUpRateAnalyzer(use_integral=True)
+
+    print(
+        f"{'persons':>8} {'baseline (ms)':>14} {'roi (ms)':>10} {'integral (ms)':>14}"
+        f" {'roi speedup':>12} {'integral speedup':>17}"
+    )
+    for n in args.persons:
+        boxes = random_boxes(rng, n, args.width, args.height)
+        expected = baseline_classify(slices, img, boxes)
+        for name, analyzer in (("roi", slices), ("integral", integral)):
+            if not np.array_equal(analyzer.classify_heads(img, boxes), expected):
+                print(f"[warn] {name} labels differ from baseline at {n} persons")
+        t_base = time_call(args.repeat, baseline_classify, slices, img, boxes)
+        t_roi = time_call(args.repeat, slices.classify_heads, img, boxes)
+        t_int = time_call(args.repeat, integral.classify_heads, img, boxes)
+        print(
+            f"{n:>8} {t_base:>14.3f} {t_roi:>10.3f} {t_int:>14.3f}"
+            f" {t_base / t_roi:>11.2f}x {t_base / t_int:>16.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
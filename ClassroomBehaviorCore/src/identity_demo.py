@@ -4,6 +4,7 @@ from pathlib import Path
 import yaml
 
 from .analytics.individual_behavior import IndividualBehaviorAnalyzer
+from .services.image_loader import PrefetchImageLoader
 from .services.yolov5_inference import Yolov5Inference
 
 APP_ROOT = Path(__file__).resolve().parents[1]
@@ -74,6 +75,16 @@ def main():
         action="store_true",
         help="Disable face recognition and use anonymous IDs",
     )
+    parser.add_argument(
+        "--prefetch", type=int, default=8, help="Images decoded ahead of inference"
+    )
+    parser.add_argument(
+        "--reduce",
+        type=int,
+        default=1,
+        choices=[1, 2, 4, 8],
+        help="Decode images at 1/N resolution",
+    )
     args = parser.parse_args()
 
     images_dir = Path(args.images_dir)
@@ -115,18 +126,32 @@ def main():
         face_labels_path=APP_ROOT
         / face_cfg.get("labels_path", "output/face_labels.json"),
         unknown_threshold=float(face_cfg.get("unknown_threshold", 60.0)),
+        face_reverify_interval=int(face_cfg.get("reverify_interval", 30)),
+        face_head_only=bool(face_cfg.get("head_only", False)),
+        face_detect_max_side=face_cfg.get("detect_max_side"),
+        face_frame_level=bool(face_cfg.get("frame_level", True)),
+        face_frame_max_side=face_cfg.get("frame_max_side"),
+        face_backend=str(face_cfg.get("backend", "lbph")),
         enable_face=(not args.no_face),
+        use_integral=bool(cfg.get("analytics", {}).get("integral_image", False)),
+        smoothing=str(cfg.get("analytics", {}).get("smoothing", "window")),
+        identity_ttl=cfg.get("analytics", {}).get("identity_ttl_frames", 300),
+        max_identities=cfg.get("analytics", {}).get("max_identities", 1000),
     )
 
     rows: list[dict] = []
-    for i, img_path in enumerate(imgs, start=1):
-        res = det.predict_image(str(img_path), annotate=False)
+    loader = PrefetchImageLoader(imgs, prefetch=args.prefetch, reduce=args.reduce)
+    for i, (img_path, img_rgb) in enumerate(loader, start=1):
+        res = det.predict_image(img_rgb, annotate=False)
         stats = analyzer.analyze_frame(res["image"], res["detections"], frame_id=i)
         rows.extend(stats["individuals"])
         print(
             f"Processed {img_path.name}: {len(stats['individuals'])} identities, overall rate={stats['overall']['head_up_rate']:.2f}"
         )
 
+    print(f"Identity store: {analyzer.histories.stats()}")
+    if analyzer.face:
+        print(f"Face cache: {analyzer.face.cache.stats()}")
     out_csv = Path(args.output_csv)
     IndividualBehaviorAnalyzer.export_csv_per_person(out_csv, rows)
     print(f"Saved per-identity CSV to: {out_csv}")
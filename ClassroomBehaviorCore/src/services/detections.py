@@ -0,0 +1,121 @@
+from collections.abc import Sequence
+from typing import Any
+
+import cv2
+import numpy as np
+
+
+class DetectionResult(Sequence):
+    """
+    Columnar detections for a single frame.
+
+    Holds one array each for `boxes` (N, 4) int xyxy, `confs` (N,) float32 and
+    `cls_ids` (N,) int. Indexing or iterating yields the legacy dicts with keys
+    xyxy, conf, cls, name; they are built on first access only.
+    """
+
+    def __init__(
+        self,
+        boxes: np.ndarray,
+        confs: np.ndarray,
+        cls_ids: np.ndarray,
+        names: dict[int, str] | list[str] | None = None,
+    ) -> None:
+        self.boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        self.confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+        self.cls_ids = np.asarray(cls_ids, dtype=np.int64).reshape(-1)
+        self.names = names if names is not None else {}
+        self._records: list[dict[str, Any]] | None = None
+
+    @classmethod
+    def from_array(
+        cls, data: np.ndarray, names: dict[int, str] | list[str] | None = None
+    ) -> "DetectionResult":
+        """
+        Build from an (N, 6) array laid out as x1, y1, x2, y2, conf, cls.
+
+        Extra columns between the box and conf (e.g. track ids) are ignored.
+        """
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim != 2:
+            data = data.reshape(-1, 6)
+        return cls(data[:, :4].astype(np.int64), data[:, -2], data[:, -1], names)
+
+    @classmethod
+    def from_tensor(
+        cls, data, names: dict[int, str] | list[str] | None = None
+    ) -> "DetectionResult":
+        """Build from an (N, 6) torch tensor with one device-to-host copy."""
+        return cls.from_array(data.detach().cpu().numpy(), names)
+
+    @classmethod
+    def empty(
+        cls, names: dict[int, str] | list[str] | None = None
+    ) -> "DetectionResult":
+        return cls.from_array(np.zeros((0, 6), dtype=np.float32), names)
+
+    def class_name(self, cls_id: int) -> str:
+        if isinstance(self.names, dict):
+            return self.names.get(cls_id, str(cls_id))
+        if 0 <= cls_id < len(self.names):
+            return self.names[cls_id]
+        return str(cls_id)
+
+    def to_list(self) -> list[dict[str, Any]]:
+        if self._records is None:
+            self._records = [
+                {
+                    "xyxy": box,
+                    "conf": conf,
+                    "cls": cls_id,
+                    "name": self.class_name(cls_id),
+                }
+                for box, conf, cls_id in zip(
+                    self.boxes.tolist(),
+                    self.confs.tolist(),
+                    self.cls_ids.tolist(),
+                    strict=True,
+                )
+            ]
+        return self._records
+
+    def __len__(self) -> int:
+        return len(self.cls_ids)
+
+    def __getitem__(self, index):
+        return self.to_list()[index]
+
+    def __repr__(self) -> str:
+        return f"DetectionResult(n={len(self)})"
+
+
+def draw_detections(
+    img: np.ndarray,
+    detections: DetectionResult,
+    color: tuple[int, int, int] = (0, 200, 255),
+    thickness: int = 2,
+) -> np.ndarray:
+    """
+    Draw boxes and `name conf` labels in place and return `img`.
+
+    `color` is in the image's own channel order, so no colour conversion is
+    needed for RGB or BGR frames.
+    """
+    for (x1, y1, x2, y2), conf, cls_id in zip(
+        detections.boxes.tolist(),
+        detections.confs.tolist(),
+        detections.cls_ids.tolist(),
+        strict=True,
+    ):
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, thickness)
+        cv2.putText(
+            img,
+            f"{detections.class_name(cls_id)} {conf:.2f}",
+            (x1, max(y1 - 4, 12)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            color,
+            1,
+            cv2.LINE_AA,
+        )
+    return img
@@ -1,17 +1,31 @@
+import hashlib
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
 
 import cv2
 import numpy as np
 
+from .face_recognizers import create_backend
+
 
 class FaceDetector:
-    def __init__(self, scale_factor: float = 1.2, min_neighbors: int = 5):
+    def __init__(
+        self,
+        scale_factor: float = 1.2,
+        min_neighbors: int = 5,
+        min_size: tuple[int, int] = (30, 30),
+    ):
         cascade_path = (
             Path(cv2.data.haarcascades) / "haarcascade_frontalface_default.xml"
         )
         self._detector = cv2.CascadeClassifier(str(cascade_path))
         self.scale_factor = scale_factor
         self.min_neighbors = min_neighbors
+        self.min_size = min_size
 
     def detect(self, img_gray: np.ndarray) -> list[tuple[int, int, int, int]]:
         faces = self._detector.detectMultiScale(
@@ -19,17 +33,141 @@ class FaceDetector:
             scaleFactor=self.scale_factor,
             minNeighbors=self.min_neighbors,
             flags=cv2.CASCADE_SCALE_IMAGE,
-            minSize=(30, 30),
+            minSize=self.min_size,
         )
         return [(int(x), int(y), int(w), int(h)) for (x, y, w, h) in faces]
 
 
+class GalleryFaceLoader:
+    """
+    Decodes and prepares gallery images on a thread pool.
+
+    Prepared faces are cached on disk as one (N, H, W) uint8 `.npy` plus a
+    JSON index keyed by file path with its mtime/size, so after a restart
+    unchanged images are read from the memory-mapped array instead of being
+    decoded again. Each write goes to a new `gallery_faces.<generation>.npy`
+    and the index, replaced atomically last, names the generation its rows
+    refer to, so a crash mid-write never pairs an index with another array.
+    """
+
+    def __init__(
+        self,
+        prep: Callable[[np.ndarray], np.ndarray],
+        cache_dir: Path | None = None,
+        workers: int | None = None,
+    ) -> None:
+        self.prep = prep
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.workers = workers or min(8, os.cpu_count() or 1)
+
+    def _read(self, path: Path) -> np.ndarray | None:
+        img = cv2.imread(str(path))
+        if img is None:
+            return None
+        return self.prep(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / "gallery_faces.json"
+
+    def _array_path(self, generation: str) -> Path:
+        return self.cache_dir / f"gallery_faces.{generation}.npy"
+
+    def _read_cache(self) -> tuple[np.ndarray | None, dict[str, dict[str, int]]]:
+        if self.cache_dir is None:
+            return None, {}
+        import json
+
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                meta = json.load(f)
+            arr = np.load(self._array_path(meta["generation"]), mmap_mode="r")
+            return arr, meta["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing, torn or pre-generation cache: rebuild it.
+            return None, {}
+
+    def _write_cache(self, rows: np.ndarray, index: dict[str, dict[str, int]]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        import json
+
+        generation = f"{time.time_ns():x}{os.getpid():x}"
+        arr_path = self._array_path(generation)
+        np.save(arr_path, rows)
+        index_path = self._index_path()
+        tmp = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "files": index}, f)
+        os.replace(tmp, index_path)
+        for old in self.cache_dir.glob("gallery_faces*.npy"):
+            if old != arr_path:
+                # May still be mapped by another process (fails on Windows).
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+    def load(self, paths: list[Path]) -> list[np.ndarray | None]:
+        """Prepared face per path (None if unreadable), in input order."""
+        cached, index = self._read_cache()
+        keys = [str(p.resolve()) for p in paths]
+        stats = [p.stat() for p in paths]
+        faces: list[np.ndarray | None] = [None] * len(paths)
+        todo: list[int] = []
+        for i, (key, st) in enumerate(zip(keys, stats, strict=True)):
+            entry = index.get(key)
+            if (
+                cached is not None
+                and entry is not None
+                and entry["mtime"] == st.st_mtime_ns
+                and entry["size"] == st.st_size
+            ):
+                faces[i] = np.array(cached[entry["row"]])
+            else:
+                todo.append(i)
+        if not todo:
+            return faces
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i, face in zip(
+                todo, pool.map(self._read, [paths[i] for i in todo]), strict=True
+            ):
+                faces[i] = face
+        if self.cache_dir is None:
+            return faces
+
+        # Keep other still-existing cached images; add this call's faces.
+        new_index: dict[str, dict[str, int]] = {}
+        rows: list[np.ndarray] = []
+        requested = set(keys)
+        if cached is not None:
+            for key, entry in index.items():
+                if key not in requested and os.path.exists(key):
+                    new_index[key] = {**entry, "row": len(rows)}
+                    rows.append(np.array(cached[entry["row"]]))
+        for key, st, face in zip(keys, stats, faces, strict=True):
+            if face is not None:
+                new_index[key] = {
+                    "mtime": st.st_mtime_ns,
+                    "size": st.st_size,
+                    "row": len(rows),
+                }
+                rows.append(face)
+        del cached  # release the memory map before replacing its file
+        if rows:
+            self._write_cache(np.stack(rows), new_index)
+        return faces
+
+
 class FaceRecognizer:
     """
-    OpenCV LBPH-based face recognizer.
+    LBPH-based face recognizer.
 
     - Trains using a gallery directory: gallery_dir/<person_name>/*.jpg
     - Saves model and label mapping to given paths
+    - `backend` selects the matcher: "lbph" (OpenCV) or "numpy" (vectorized
+      batch matching, see `face_recognizers.NumpyLBPHBackend`)
+    - `sync=False` only loads the saved model, without checking the gallery
+      or training (for workers of a process that has already synced it)
     """
 
     def __init__(
@@ -38,36 +176,75 @@ class FaceRecognizer:
         model_path: Path,
         labels_path: Path,
         unknown_threshold: float = 60.0,
+        backend: str = "lbph",
+        manifest_path: Path | None = None,
+        cache_dir: Path | None = None,
+        workers: int | None = None,
+        sync: bool = True,
     ) -> None:
+        # The OpenCV LBPH backend requires opencv-contrib-python
+        self._model = create_backend(backend)
         self.gallery_dir = Path(gallery_dir)
-        self.model_path = Path(model_path)
+        self.model_path = self._model.model_file(Path(model_path))
         self.labels_path = Path(labels_path)
+        # Gallery file -> {sha1, mtime, size} of what the model was trained on.
+        # Kept next to the backend's own model file (e.g. face_lbph.xml and
+        # face_lbph.npz), so switching backends never marks files as learned
+        # by a model that has not seen them.
+        self.manifest_path = (
+            Path(manifest_path)
+            if manifest_path is not None
+            else self.model_path.with_name(self.model_path.name + ".manifest.json")
+        )
         self.unknown_threshold = unknown_threshold
-
-        # LBPH requires opencv-contrib-python
-        self._model = cv2.face.LBPHFaceRecognizer_create()
+        self.loader = GalleryFaceLoader(
+            self._prep_face,
+            (
+                cache_dir
+                if cache_dir is not None
+                else self.model_path.parent / "face_cache"
+            ),
+            workers,
+        )
         self._label_to_name: dict[int, str] = {}
+        self._manifest: dict[str, dict[str, Any]] = {}
+        self._trained = False
 
         if self.model_path.exists() and self.labels_path.exists():
             self._load()
-        else:
+            if not sync:
+                pass
+            elif self.manifest_path.exists():
+                self.sync_gallery()
+            elif self.gallery_dir.exists():
+                # Model predates the manifest; rebuild once to create it.
+                self.train_from_gallery()
+        elif sync:
             self.train_from_gallery()
 
     def _load(self) -> None:
-        self._model.read(str(self.model_path))
+        self._model.read(self.model_path)
+        self._trained = True
         import json
 
         with open(self.labels_path, encoding="utf-8") as f:
-            self._label_to_name = json.load(f)
+            # JSON object keys are strings; labels are ints.
+            self._label_to_name = {int(k): v for k, v in json.load(f).items()}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self._manifest = json.load(f)
 
     def _save(self) -> None:
         self.model_path.parent.mkdir(parents=True, exist_ok=True)
         self.labels_path.parent.mkdir(parents=True, exist_ok=True)
-        self._model.write(str(self.model_path))
+        self._model.write(self.model_path)
         import json
 
         with open(self.labels_path, "w", encoding="utf-8") as f:
             json.dump(self._label_to_name, f, ensure_ascii=False, indent=2)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
 
     @staticmethod
     def _prep_face(
@@ -77,10 +254,39 @@ class FaceRecognizer:
         face = cv2.equalizeHist(face)
         return face
 
+    @staticmethod
+    def _file_entry(path: Path, digest: bool = True) -> dict[str, Any]:
+        st = path.stat()
+        entry: dict[str, Any] = {"mtime": st.st_mtime_ns, "size": st.st_size}
+        if digest:
+            entry["sha1"] = hashlib.sha1(path.read_bytes()).hexdigest()
+        return entry
+
+    def _gallery_files(self) -> list[tuple[str, Path]]:
+        """(person name, image path) for every gallery image, in label order."""
+        files: list[tuple[str, Path]] = []
+        for person_dir in sorted(self.gallery_dir.iterdir()):
+            if person_dir.is_dir():
+                files.extend(
+                    (person_dir.name, p) for p in sorted(person_dir.glob("*.jpg"))
+                )
+        return files
+
+    def _manifest_key(self, img_path: Path) -> str:
+        return img_path.relative_to(self.gallery_dir).as_posix()
+
+    def _gallery_key(self, img_path: Path) -> str | None:
+        """Manifest key if `sync_gallery` would list this file, else None."""
+        try:
+            rel = img_path.resolve().relative_to(self.gallery_dir.resolve())
+        except ValueError:
+            return None
+        return rel.as_posix() if len(rel.parts) == 2 and rel.suffix == ".jpg" else None
+
     def train_from_gallery(self) -> None:
-        faces: list[np.ndarray] = []
         labels: list[int] = []
         label_to_name: dict[int, str] = {}
+        manifest: dict[str, dict[str, Any]] = {}
         current_label = 0
 
         if not self.gallery_dir.exists():
@@ -88,41 +294,228 @@ class FaceRecognizer:
             self._label_to_name = {}
             return
 
+        paths: list[Path] = []
         for person_dir in sorted(self.gallery_dir.iterdir()):
             if not person_dir.is_dir():
                 continue
             name = person_dir.name
-            for img_path in person_dir.glob("*.jpg"):
-                img = cv2.imread(str(img_path))
-                if img is None:
-                    continue
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                face_prep = self._prep_face(gray)
-                faces.append(face_prep)
+            for img_path in sorted(person_dir.glob("*.jpg")):
+                manifest[self._manifest_key(img_path)] = self._file_entry(img_path)
+                paths.append(img_path)
                 labels.append(current_label)
             label_to_name[current_label] = name
             current_label += 1
 
+        prepared = self.loader.load(paths)
+        labels = [lb for lb, f in zip(labels, prepared, strict=True) if f is not None]
+        faces: list[np.ndarray] = [f for f in prepared if f is not None]
+
         if faces and labels:
             self._model.train(faces, np.array(labels))
+            self._trained = True
             self._label_to_name = label_to_name
+            self._manifest = manifest
             self._save()
         else:
             self._label_to_name = {}
 
+    def enroll(
+        self,
+        name: str,
+        images: list[str | Path | np.ndarray],
+        save: bool = True,
+    ) -> int:
+        """
+        Add face images for `name` without retraining from scratch.
+
+        Images are paths or arrays (grayscale or BGR, as from cv2.imread).
+        Only files under `gallery_dir` survive a later full retrain; those
+        are recorded in the manifest so `sync_gallery` does not add them
+        again. Returns the number of faces added.
+        """
+        paths = [Path(img) for img in images if isinstance(img, (str, Path))]
+        faces = [f for f in self.loader.load(paths) if f is not None]
+        for path in paths:
+            key = self._gallery_key(path)
+            if key is not None:
+                self._manifest[key] = self._file_entry(path)
+        for img in images:
+            if isinstance(img, np.ndarray):
+                if img.ndim == 3:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                faces.append(self._prep_face(img))
+        if not faces:
+            return 0
+
+        label = next((k for k, v in self._label_to_name.items() if v == name), None)
+        if label is None:
+            label = max(self._label_to_name, default=-1) + 1
+            self._label_to_name[label] = name
+        labels = np.full(len(faces), label, dtype=np.int32)
+        if self._trained:
+            self._model.update(faces, labels)
+        else:
+            self._model.train(faces, labels)
+            self._trained = True
+        if save:
+            self._save()
+        return len(faces)
+
+    def sync_gallery(self) -> int:
+        """
+        Enroll gallery images added since the last sync.
+
+        Files are matched against the manifest by mtime/size first and by
+        SHA-1 when those differ. New files are enrolled incrementally; a
+        changed or deleted file triggers a full `train_from_gallery`, since
+        trained samples cannot be removed. Returns the number of new faces.
+        """
+        if not self.gallery_dir.exists():
+            return 0
+        manifest: dict[str, dict[str, Any]] = {}
+        added: dict[str, list[Path]] = {}
+        rebuild = False
+        for name, img_path in self._gallery_files():
+            key = self._manifest_key(img_path)
+            old = self._manifest.get(key)
+            entry = self._file_entry(img_path, digest=False)
+            if old is not None and all(old.get(k) == entry[k] for k in entry):
+                manifest[key] = old
+                continue
+            entry = self._file_entry(img_path)
+            manifest[key] = entry
+            if old is None:
+                added.setdefault(name, []).append(img_path)
+            elif old.get("sha1") != entry["sha1"]:
+                rebuild = True
+        if rebuild or set(self._manifest) - set(manifest):
+            self.train_from_gallery()
+            return 0
+
+        count = sum(self.enroll(n, paths, save=False) for n, paths in added.items())
+        if manifest != self._manifest:
+            self._manifest = manifest
+            self._save()
+        return count
+
     def recognize(self, img_gray_face: np.ndarray) -> tuple[str, float]:
+        return self.recognize_batch([img_gray_face])[0]
+
+    def recognize_batch(
+        self, img_gray_faces: list[np.ndarray]
+    ) -> list[tuple[str, float]]:
         if not self._label_to_name:
-            return "Unknown", float("inf")
-        pred_label, confidence = self._model.predict(self._prep_face(img_gray_face))
-        name = self._label_to_name.get(int(pred_label), "Unknown")
-        if confidence > self.unknown_threshold:
-            return "Unknown", confidence
-        return name, confidence
+            return [("Unknown", float("inf"))] * len(img_gray_faces)
+        if not img_gray_faces:
+            return []
+        labels, distances = self._model.predict_batch(
+            [self._prep_face(f) for f in img_gray_faces]
+        )
+        results: list[tuple[str, float]] = []
+        for label, confidence in zip(labels.tolist(), distances.tolist(), strict=True):
+            if confidence > self.unknown_threshold:
+                results.append(("Unknown", confidence))
+            else:
+                results.append((self._label_to_name.get(label, "Unknown"), confidence))
+        return results
+
+
+class FaceIdentityCache:
+    """
+    Caches the recognized name per tracked person (or box region).
+
+    A cached name is reused until `reverify_interval` frames have passed,
+    the box has moved (IoU with the box at verification below `move_iou`),
+    or, for Unknown / marginal matches (LBPH distance at least `margin` of
+    the unknown threshold), until the shorter `retry_interval` has passed.
+    """
+
+    def __init__(
+        self,
+        reverify_interval: int = 30,
+        retry_interval: int = 5,
+        move_iou: float = 0.5,
+        margin: float = 0.8,
+        ttl_frames: int = 60,
+    ) -> None:
+        self.reverify_interval = reverify_interval
+        self.retry_interval = retry_interval
+        self.move_iou = move_iou
+        self.margin = margin
+        self.ttl_frames = ttl_frames
+        # key -> (name, confidence, box at verification, verified frame, last seen)
+        self._entries: dict[object, tuple[str, float, list[int], int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def region_key(box: list[int], grid: int = 32) -> tuple[int, int]:
+        """Key for untracked boxes: the grid cell holding the box centre."""
+        x1, y1, x2, y2 = box
+        return ((x1 + x2) // 2 // grid, (y1 + y2) // 2 // grid)
+
+    @staticmethod
+    def _iou(a: list[int], b: list[int]) -> float:
+        iw = min(a[2], b[2]) - max(a[0], b[0])
+        ih = min(a[3], b[3]) - max(a[1], b[1])
+        if iw <= 0 or ih <= 0:
+            return 0.0
+        inter = iw * ih
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    def lookup(
+        self, key: object, box: list[int], frame_id: int, unknown_threshold: float
+    ) -> str | None:
+        """Return the cached name if still valid, otherwise None (a miss)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            name, confidence, ref_box, verified, _ = entry
+            marginal = (
+                name == "Unknown" or confidence >= self.margin * unknown_threshold
+            )
+            interval = self.retry_interval if marginal else self.reverify_interval
+            if (
+                frame_id - verified < interval
+                and self._iou(box, ref_box) >= self.move_iou
+            ):
+                self._entries[key] = (name, confidence, ref_box, verified, frame_id)
+                self.hits += 1
+                return name
+        self.misses += 1
+        return None
+
+    def store(
+        self, key: object, name: str, confidence: float, box: list[int], frame_id: int
+    ) -> None:
+        self._entries[key] = (name, confidence, list(box), frame_id, frame_id)
+
+    def prune(self, frame_id: int) -> None:
+        """Drop entries whose person has not been seen for `ttl_frames`."""
+        stale = [
+            k for k, e in self._entries.items() if frame_id - e[4] > self.ttl_frames
+        ]
+        for k in stale:
+            del self._entries[k]
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
 
 
 class FacePipeline:
     """
     Combines face detection + recognition.
+
+    - `head_region_ratio` restricts faces to the top band of the person box
+      (None uses the whole box): `recognize_person` only scans the band and
+      `assign_identities` only gives a box the faces centred inside it
+    - `detect_max_side` downscales the person region searched by
+      `recognize_person` so its longer side is at most that many pixels;
+      face boxes are mapped back to full resolution
+    - `assign_identities` runs one cascade pass over the whole frame
+      (downscaled to `frame_max_side`) and hands each face to the person box
+      containing it, instead of scanning every person ROI separately
+    - `sync_gallery=False` loads the saved model as is (see `FaceRecognizer`)
     """
 
     def __init__(
@@ -131,23 +524,161 @@ class FacePipeline:
         model_path: Path,
         labels_path: Path,
         unknown_threshold: float = 60.0,
+        reverify_interval: int = 30,
+        head_region_ratio: float | None = None,
+        detect_max_side: int | None = None,
+        frame_max_side: int | None = None,
+        backend: str = "lbph",
+        sync_gallery: bool = True,
     ) -> None:
         self.detector = FaceDetector()
+        self.head_region_ratio = head_region_ratio
+        self.detect_max_side = detect_max_side
+        self.frame_max_side = frame_max_side
         self.recognizer = FaceRecognizer(
-            gallery_dir, model_path, labels_path, unknown_threshold
+            gallery_dir,
+            model_path,
+            labels_path,
+            unknown_threshold,
+            backend,
+            sync=sync_gallery,
         )
+        self.cache = FaceIdentityCache(reverify_interval=reverify_interval)
 
-    def assign_identity(self, img_rgb: np.ndarray, person_xyxy: list[int]) -> str:
+    def reset_cache(self) -> None:
+        """Forget all cached identities, e.g. before reusing the pipeline."""
+        self.cache = FaceIdentityCache(reverify_interval=self.cache.reverify_interval)
+
+    def _detect_scaled(
+        self, gray: np.ndarray, max_side: int | None
+    ) -> list[tuple[int, int, int, int]]:
+        """Detect on a downscaled copy when large; boxes are in `gray` coords."""
+        longest = max(gray.shape[:2])
+        if not max_side or longest <= max_side:
+            return self.detector.detect(gray)
+        scale = max_side / longest
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return [
+            (int(x / scale), int(y / scale), int(w / scale), int(h / scale))
+            for (x, y, w, h) in self.detector.detect(small)
+        ]
+
+    def recognize_person(
+        self, img_rgb: np.ndarray, person_xyxy: list[int]
+    ) -> tuple[str, float]:
         x1, y1, x2, y2 = person_xyxy
+        if self.head_region_ratio is not None:
+            y2 = min(y2, y1 + max(1, int((y2 - y1) * self.head_region_ratio)))
         roi = img_rgb[max(0, y1) : max(0, y2), max(0, x1) : max(0, x2)]
         if roi.size == 0:
-            return "Unknown"
+            return "Unknown", float("inf")
         gray = cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY)
-        faces = self.detector.detect(gray)
+        faces = self._detect_scaled(gray, self.detect_max_side)
         if not faces:
-            return "Unknown"
+            return "Unknown", float("inf")
         # choose largest face
         fx, fy, fw, fh = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0]
         face_gray = gray[fy : fy + fh, fx : fx + fw]
-        name, _ = self.recognizer.recognize(face_gray)
+        return self.recognizer.recognize(face_gray)
+
+    def assign_identity(self, img_rgb: np.ndarray, person_xyxy: list[int]) -> str:
+        name, _ = self.recognize_person(img_rgb, person_xyxy)
+        return name
+
+    def assign_identity_cached(
+        self,
+        img_rgb: np.ndarray,
+        person_xyxy: list[int],
+        key: object,
+        frame_id: int,
+    ) -> str:
+        """
+        Like `assign_identity`, but reuses the cached result for `key` (a
+        track id or `FaceIdentityCache.region_key`) while it is still valid.
+        """
+        name = self.cache.lookup(
+            key, person_xyxy, frame_id, self.recognizer.unknown_threshold
+        )
+        if name is None:
+            name, confidence = self.recognize_person(img_rgb, person_xyxy)
+            self.cache.store(key, name, confidence, person_xyxy, frame_id)
         return name
+
+    @staticmethod
+    def _faces_to_persons(
+        faces: list[tuple[int, int, int, int]],
+        boxes: np.ndarray,
+        head_ratio: float | None = None,
+    ) -> list[tuple[int, int, int, int] | None]:
+        """
+        Give each face to the smallest person box containing its centre (in
+        the top `head_ratio` band of the box when set), then keep the
+        largest face per person.
+        """
+        chosen: list[tuple[int, int, int, int] | None] = [None] * len(boxes)
+        if not faces or len(boxes) == 0:
+            return chosen
+        f = np.asarray(faces, dtype=np.float64)
+        cx = f[:, 0] + f[:, 2] / 2
+        cy = f[:, 1] + f[:, 3] / 2
+        bottom = boxes[:, 3]
+        if head_ratio is not None:
+            bottom = boxes[:, 1] + np.maximum(
+                1, ((boxes[:, 3] - boxes[:, 1]) * head_ratio).astype(np.int64)
+            )
+        inside = (
+            (cx[:, None] >= boxes[None, :, 0])
+            & (cx[:, None] < boxes[None, :, 2])
+            & (cy[:, None] >= boxes[None, :, 1])
+            & (cy[:, None] < bottom[None, :])
+        )
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        owner = np.where(inside, area[None, :], np.inf).argmin(axis=1)
+        face_area = f[:, 2] * f[:, 3]
+        for i in np.argsort(face_area, kind="stable").tolist():
+            if inside[i, owner[i]]:
+                chosen[owner[i]] = faces[i]
+        return chosen
+
+    def assign_identities(
+        self,
+        img_rgb: np.ndarray,
+        boxes: np.ndarray,
+        keys: list[object],
+        frame_id: int,
+        use_cache: bool = True,
+    ) -> list[str]:
+        """
+        Identify every person of a frame with at most one face-detection pass.
+
+        Cached results (see `assign_identity_cached`) are reused; the frame is
+        only scanned when some person needs recognition. Pass
+        `use_cache=False` for unrelated still images.
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        box_list = boxes.tolist()
+        threshold = self.recognizer.unknown_threshold
+        names = [
+            self.cache.lookup(k, b, frame_id, threshold) if use_cache else None
+            for k, b in zip(keys, box_list, strict=True)
+        ]
+        todo = [i for i, n in enumerate(names) if n is None]
+        if not todo:
+            return names
+
+        gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
+        faces = self._detect_scaled(gray, self.frame_max_side)
+        # Ownership is decided against every box, so a cached person's face
+        # is not handed to an overlapping box that needs recognition.
+        owned = self._faces_to_persons(faces, boxes, self.head_region_ratio)
+        with_face = [(i, owned[i]) for i in todo if owned[i] is not None]
+        results = self.recognizer.recognize_batch(
+            [gray[fy : fy + fh, fx : fx + fw] for _, (fx, fy, fw, fh) in with_face]
+        )
+        recognized = {i: res for (i, _), res in zip(with_face, results, strict=True)}
+        for i in todo:
+            name, confidence = recognized.get(i, ("Unknown", float("inf")))
+            if use_cache:
+                self.cache.store(keys[i], name, confidence, box_list[i], frame_id)
+            names[i] = name
+        return names
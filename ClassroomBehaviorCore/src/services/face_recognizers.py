@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class RecognizerBackend(ABC):
+    """
+    Interface for face recognizer backends used by `FaceRecognizer`.
+
+    Faces are prepared (128x128, equalized) uint8 arrays. Distances follow
+    the LBPH convention: lower is a better match.
+    """
+
+    def model_file(self, model_path: Path) -> Path:
+        return model_path
+
+    @abstractmethod
+    def train(self, faces: list[np.ndarray], labels: np.ndarray) -> None: ...
+
+    @abstractmethod
+    def update(self, faces: list[np.ndarray], labels: np.ndarray) -> None:
+        """Add samples without discarding the ones already trained."""
+
+    @abstractmethod
+    def predict_batch(self, faces: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """Return (labels, distances) for each face."""
+
+    @abstractmethod
+    def read(self, path: Path) -> None: ...
+
+    @abstractmethod
+    def write(self, path: Path) -> None: ...
+
+
+class OpenCVLBPHBackend(RecognizerBackend):
+    """OpenCV's LBPH recognizer (requires opencv-contrib-python)."""
+
+    def __init__(self) -> None:
+        self._model = cv2.face.LBPHFaceRecognizer_create()
+
+    def train(self, faces: list[np.ndarray], labels: np.ndarray) -> None:
+        self._model.train(faces, labels)
+
+    def update(self, faces: list[np.ndarray], labels: np.ndarray) -> None:
+        self._model.update(faces, labels)
+
+    def predict_batch(self, faces: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        preds = [self._model.predict(face) for face in faces]
+        labels = np.array([int(p[0]) for p in preds], dtype=np.int64)
+        distances = np.array([float(p[1]) for p in preds], dtype=np.float64)
+        return labels, distances
+
+    def read(self, path: Path) -> None:
+        self._model.read(str(path))
+
+    def write(self, path: Path) -> None:
+        self._model.write(str(path))
+
+
+class NumpyLBPHBackend(RecognizerBackend):
+    """
+    Vectorized LBPH matching against an in-memory gallery matrix.
+
+    Histograms follow OpenCV's LBPH (radius 1, 8 neighbours, 8x8 grid,
+    per-cell normalized) and distances are the same chi-square, so
+    `unknown_threshold` keeps its meaning. All faces of a frame are encoded
+    in one batch; a sqrt-histogram (Hellinger) embedding shortlists
+    `shortlist` gallery candidates per face with one matrix product, and
+    only those are scored exactly.
+    """
+
+    radius = 1
+    neighbors = 8
+    grid = 8
+
+    def __init__(self, shortlist: int = 16) -> None:
+        self.shortlist = shortlist
+        self._hists = np.zeros((0, 0), dtype=np.float32)
+        self._embed = np.zeros((0, 0), dtype=np.float32)
+        self._labels = np.zeros(0, dtype=np.int64)
+
+    def model_file(self, model_path: Path) -> Path:
+        return model_path.with_suffix(".npz")
+
+    @classmethod
+    def histograms(cls, faces: np.ndarray) -> np.ndarray:
+        """(B, H, W) uint8 faces -> (B, grid*grid*256) LBP histograms."""
+        src = np.asarray(faces, dtype=np.float32)
+        b, h, w = src.shape
+        r = cls.radius
+        center = src[:, r : h - r, r : w - r]
+        codes = np.zeros(center.shape, dtype=np.int64)
+        for n in range(cls.neighbors):
+            x = np.float32(r * np.cos(2.0 * np.pi * n / cls.neighbors))
+            y = np.float32(-r * np.sin(2.0 * np.pi * n / cls.neighbors))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            tx, ty = x - fx, y - fy
+            w1, w2 = (1 - tx) * (1 - ty), tx * (1 - ty)
+            w3, w4 = (1 - tx) * ty, tx * ty
+
+            def shifted(dy: int, dx: int) -> np.ndarray:
+                return src[:, r + dy : h - r + dy, r + dx : w - r + dx]
+
+            t = (
+                w1 * shifted(fy, fx)
+                + w2 * shifted(fy, cx)
+                + w3 * shifted(cy, fx)
+                + w4 * shifted(cy, cx)
+            )
+            hit = (t > center) | (np.abs(t - center) < np.finfo(np.float32).eps)
+            codes += hit.astype(np.int64) << n
+
+        g = cls.grid
+        ch, cw = codes.shape[1] // g, codes.shape[2] // g
+        cells = codes[:, : ch * g, : cw * g].reshape(b, g, ch, g, cw)
+        cells = cells.transpose(0, 1, 3, 2, 4).reshape(b, g * g, ch * cw)
+        bins = 1 << cls.neighbors
+        offsets = (np.arange(b)[:, None] * g * g + np.arange(g * g)[None, :]) * bins
+        flat = (cells + offsets[:, :, None]).ravel()
+        hist = np.bincount(flat, minlength=b * g * g * bins).astype(np.float32)
+        return hist.reshape(b, g * g * bins) / np.float32(ch * cw)
+
+    @staticmethod
+    def chi_square(query: np.ndarray, gallery: np.ndarray) -> np.ndarray:
+        """OpenCV HISTCMP_CHISQR_ALT between one (D,) and (M, D) histograms."""
+        num = (gallery - query) ** 2
+        den = gallery + query
+        return 2.0 * np.divide(num, den, out=np.zeros_like(num), where=den > 0).sum(
+            axis=1
+        )
+
+    def train(self, faces: list[np.ndarray], labels: np.ndarray) -> None:
+        self._hists = self.histograms(np.stack(faces))
+        self._embed = np.sqrt(self._hists)
+        self._labels = np.asarray(labels, dtype=np.int64)
+
+    def update(self, faces: list[np.ndarray], labels: np.ndarray) -> None:
+        if len(self._labels) == 0:
+            self.train(faces, labels)
+            return
+        hists = self.histograms(np.stack(faces))
+        self._hists = np.concatenate([self._hists, hists])
+        self._embed = np.concatenate([self._embed, np.sqrt(hists)])
+        self._labels = np.concatenate(
+            [self._labels, np.asarray(labels, dtype=np.int64)]
+        )
+
+    def predict_batch(self, faces: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        n = len(faces)
+        labels = np.full(n, -1, dtype=np.int64)
+        distances = np.full(n, np.inf, dtype=np.float64)
+        if n == 0 or len(self._labels) == 0:
+            return labels, distances
+        queries = self.histograms(np.stack(faces))
+        k = min(self.shortlist, len(self._labels))
+        # Hellinger similarity: larger dot product of sqrt-histograms = closer.
+        sims = np.sqrt(queries) @ self._embed.T
+        candidates = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        for i in range(n):
+            cand = candidates[i]
+            d = self.chi_square(queries[i], self._hists[cand])
+            best = int(d.argmin())
+            labels[i] = self._labels[cand[best]]
+            distances[i] = float(d[best])
+        return labels, distances
+
+    def read(self, path: Path) -> None:
+        data = np.load(path)
+        self._hists = data["hists"]
+        self._labels = data["labels"]
+        self._embed = np.sqrt(self._hists)
+
+    def write(self, path: Path) -> None:
+        np.savez(path, hists=self._hists, labels=self._labels)
+
+
+BACKENDS = {
+    "lbph": OpenCVLBPHBackend,
+    "numpy": NumpyLBPHBackend,
+}
+
+
+def create_backend(name: str) -> RecognizerBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown face recognizer backend: {name!r} (expected one of {sorted(BACKENDS)})"
+        ) from None
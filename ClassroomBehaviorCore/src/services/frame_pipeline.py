@@ -0,0 +1,173 @@
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+
+class FrameQueue:
+    """
+    Bounded hand-off queue between two pipeline stages.
+
+    When full, `put` either blocks until the consumer catches up or, with
+    `drop_oldest`, discards the oldest queued item so the consumer always
+    works on the most recent frames; `on_drop` is called with each discarded
+    item. After `close`, `put` returns False and `get` returns None once the
+    remaining items are drained.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2,
+        drop_oldest: bool = False,
+        on_drop: Callable[[Any], None] | None = None,
+    ) -> None:
+        self.maxsize = max(1, int(maxsize))
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items: deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item: Any) -> bool:
+        dropped = None
+        with self._cond:
+            if not self.drop_oldest:
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._items) < self.maxsize
+                )
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return True
+
+    def get(self) -> Any | None:
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or bool(self._items))
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self, discard: bool = False) -> None:
+        """Stop accepting items; with `discard`, also drop the queued ones."""
+        with self._cond:
+            self._closed = True
+            if discard:
+                self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class BufferPool:
+    """
+    Free list of reusable frame buffers.
+
+    A buffer goes back to the pool only when its owner is done with it, so a
+    buffer still being analysed or displayed is never overwritten however
+    many frames the producer runs ahead. `acquire` returns None when no
+    buffer is free; the caller then allocates a new one.
+    """
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = max(0, int(maxsize))
+        self._free: deque[Any] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Any | None:
+        with self._lock:
+            return self._free.popleft() if self._free else None
+
+    def release(self, buf: Any | None) -> None:
+        if buf is None:
+            return
+        with self._lock:
+            if len(self._free) < self.maxsize:
+                self._free.append(buf)
+
+
+class StageLatency:
+    """Exponential moving average of per-stage latency, in milliseconds."""
+
+    def __init__(self, alpha: float = 0.1) -> None:
+        self.alpha = alpha
+        self._ms: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        ms = seconds * 1000.0
+        with self._lock:
+            prev = self._ms.get(stage)
+            self._ms[stage] = ms if prev is None else prev + self.alpha * (ms - prev)
+
+    def since(self, stage: str, start: float) -> float:
+        """Record the time elapsed since `start` (perf_counter); return now."""
+        now = time.perf_counter()
+        self.record(stage, now - start)
+        return now
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._ms)
+
+
+class AdaptiveScheduler:
+    """
+    Choose which frames to run detection on to hold `target_fps`.
+
+    Keeps moving averages of the cost of a detected frame and of a frame that
+    reuses the previous detections, and runs detection every `stride` frames,
+    the smallest stride whose average per-frame cost fits the frame budget
+    (capped at `max_stride`).
+    """
+
+    def __init__(
+        self, target_fps: float, max_stride: int = 8, alpha: float = 0.2
+    ) -> None:
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+        self.budget = 1.0 / float(target_fps)
+        self.max_stride = max(1, int(max_stride))
+        self.alpha = alpha
+        self.stride = 1
+        self._infer_s: float | None = None
+        self._reuse_s = 0.0
+        self._since = self.max_stride
+
+    def should_infer(self) -> bool:
+        return self._infer_s is None or self._since >= self.stride
+
+    def record(self, seconds: float, inferred: bool) -> None:
+        """Report the processing time of a frame and whether it was detected."""
+        if inferred:
+            self._infer_s = (
+                seconds
+                if self._infer_s is None
+                else self._infer_s + self.alpha * (seconds - self._infer_s)
+            )
+            self._since = 1
+        else:
+            self._reuse_s += self.alpha * (seconds - self._reuse_s)
+            self._since += 1
+        self.stride = self._choose_stride()
+
+    def _choose_stride(self) -> int:
+        if self._infer_s is None or self._infer_s <= self.budget:
+            return 1
+        if self._reuse_s >= self.budget:
+            return self.max_stride
+        # (infer + (k - 1) * reuse) / k <= budget
+        k = (self._infer_s - self._reuse_s) / (self.budget - self._reuse_s)
+        return int(min(self.max_stride, max(1, math.ceil(k))))
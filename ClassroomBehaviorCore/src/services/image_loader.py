@@ -0,0 +1,99 @@
+import os
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Downscale factor -> imread flag; JPEG decoders skip most of the IDCT work.
+IMREAD_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class PrefetchImageLoader:
+    """
+    Iterates `(path, image)` over image files, decoding ahead on threads.
+
+    Up to `prefetch` images are read, decoded and converted to RGB on a
+    thread pool while the consumer runs inference on earlier ones, so disk
+    and JPEG decode overlap with the model. With `rgb=False` images are
+    yielded BGR as decoded, for models that read BGR. `reduce` (2, 4 or 8) decodes at
+    that fraction of the resolution; detections are then in the reduced
+    image's coordinates. Unreadable files raise FileNotFoundError when they
+    are reached, or with `on_error` are passed to it and skipped.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str | Path],
+        prefetch: int = 8,
+        workers: int | None = None,
+        reduce: int = 1,
+        rgb: bool = True,
+        on_error: Callable[[str | Path, Exception], None] | None = None,
+    ) -> None:
+        if reduce not in IMREAD_FLAGS:
+            raise ValueError(f"reduce must be one of {sorted(IMREAD_FLAGS)}")
+        self.paths = list(paths)
+        self.prefetch = max(1, int(prefetch))
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.reduce = reduce
+        self.rgb = rgb
+        self.on_error = on_error
+
+    def read(self, path: str | Path) -> np.ndarray:
+        img = cv2.imread(str(path), IMREAD_FLAGS[self.reduce])
+        if img is None:
+            raise FileNotFoundError(f"无法读取图像: {path}")
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if self.rgb else img
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __iter__(self) -> Iterator[tuple[str | Path, np.ndarray]]:
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        pending: deque[tuple[str | Path, Future]] = deque()
+        todo = iter(self.paths)
+        try:
+            for path in todo:
+                pending.append((path, pool.submit(self.read, path)))
+                if len(pending) >= self.prefetch:
+                    break
+            while pending:
+                path, fut = pending.popleft()
+                nxt = next(todo, None)
+                if nxt is not None:
+                    pending.append((nxt, pool.submit(self.read, nxt)))
+                try:
+                    img = fut.result()
+                except (OSError, cv2.error) as exc:
+                    if self.on_error is None:
+                        raise
+                    self.on_error(path, exc)
+                    continue
+                yield path, img
+        finally:
+            # Also reached when the consumer stops early.
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def batches(
+        self, batch_size: int
+    ) -> Iterator[tuple[list[str | Path], list[np.ndarray]]]:
+        """Group the prefetched images into lists of `batch_size`."""
+        batch_size = max(1, int(batch_size))
+        paths: list[str | Path] = []
+        images: list[np.ndarray] = []
+        for path, img in self:
+            paths.append(path)
+            images.append(img)
+            if len(paths) == batch_size:
+                yield paths, images
+                paths, images = [], []
+        if paths:
+            yield paths, images
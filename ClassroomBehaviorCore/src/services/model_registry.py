@@ -0,0 +1,59 @@
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .yolov8_inference import Yolov8Inference
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded YOLOv8 models.
+
+    Models are keyed by (weights, device, half). `get` returns a fresh
+    `Yolov8Inference` wrapper around the cached model, so per-run settings
+    such as conf/iou/imgsz/classes never trigger a reload. Wrappers of the
+    same model share its predictor, which keeps the settings of the last
+    call, so they must not run inference concurrently. Ultralytics (and
+    torch) are imported on first use only.
+    """
+
+    def __init__(self) -> None:
+        self._models: dict[tuple[str, str, bool], Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _weights_key(weights: str | Path) -> str:
+        path = Path(weights)
+        return str(path.resolve()) if path.exists() else str(weights)
+
+    def get(
+        self,
+        weights: str | Path = "yolov8n.pt",
+        device: str = "",
+        half: bool = False,
+        **params: Any,
+    ) -> "Yolov8Inference":
+        from .yolov8_inference import Yolov8Inference
+
+        key = (self._weights_key(weights), device, bool(half))
+        # Held while loading so concurrent callers (e.g. warm-up) load once.
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                infer = Yolov8Inference(weights, device=device, half=half, **params)
+                self._models[key] = infer.model
+                return infer
+        return Yolov8Inference(weights, device=device, half=half, model=model, **params)
+
+    def is_loaded(
+        self, weights: str | Path, device: str = "", half: bool = False
+    ) -> bool:
+        return (self._weights_key(weights), device, bool(half)) in self._models
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+registry = ModelRegistry()
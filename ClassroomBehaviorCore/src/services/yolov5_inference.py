@@ -5,6 +5,8 @@ import cv2
 import numpy as np
 import torch
 
+from .detections import DetectionResult
+
 
 class Yolov5Inference:
     """
@@ -71,26 +73,15 @@ class Yolov5Inference:
         Run detection on a single image.
 
         Returns dict with keys: `image`, `detections`, `annotated` (if annotate).
-        - `detections` is a list of dicts with keys: xyxy, conf, cls, name
+        - `detections` is a `DetectionResult`; indexing or iterating it yields
+          dicts with keys: xyxy, conf, cls, name
         - `image` and `annotated` are RGB numpy arrays
         """
         img_rgb = self._ensure_rgb(img)
         results = self._model(img_rgb, size=self.imgsz)
-        df = results.pandas().xyxy[0]
-        detections: list[dict[str, Any]] = []
-        for _, row in df.iterrows():
-            xmin = int(row.get("xmin", row.get("left", 0)))
-            ymin = int(row.get("ymin", row.get("top", 0)))
-            xmax = int(row.get("xmax", row.get("right", 0)))
-            ymax = int(row.get("ymax", row.get("bottom", 0)))
-            detections.append(
-                {
-                    "xyxy": [xmin, ymin, xmax, ymax],
-                    "conf": float(row["confidence"]),
-                    "cls": int(row["class"]),
-                    "name": str(row.get("name", row.get("class", ""))),
-                }
-            )
+        detections = DetectionResult.from_tensor(
+            results.xyxy[0], getattr(results, "names", None)
+        )
         annotated = None
         if annotate:
             # results.render() modifies internal images list (BGR). Convert to RGB.
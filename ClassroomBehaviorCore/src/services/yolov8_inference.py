@@ -1,9 +1,12 @@
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
 import cv2
 import numpy as np
 
+from .detections import DetectionResult
+
 try:
     from ultralytics import YOLO
 except Exception as e:  # pragma: no cover
@@ -23,8 +26,10 @@ class Yolov8Inference:
         classes: list[int] | None = None,
         max_det: int = 1000,
         half: bool = False,
+        model: YOLO | None = None,
     ) -> None:
-        self.model = YOLO(str(weights))
+        # Pass an already loaded `model` to skip reading the weights again.
+        self.model = model if model is not None else YOLO(str(weights))
         self.device = device
         self.imgsz = imgsz
         self.conf = conf
@@ -34,13 +39,17 @@ class Yolov8Inference:
         self.half = half
         self.names = self.model.names
 
+    @staticmethod
+    def _load_image_bgr(path: str | Path) -> np.ndarray:
+        bgr = cv2.imread(str(path))
+        if bgr is None:
+            raise FileNotFoundError(f"无法读取图像: {path}")
+        return bgr
+
     @staticmethod
     def _load_image_rgb(img: str | Path | np.ndarray) -> np.ndarray:
         if isinstance(img, (str, Path)):
-            bgr = cv2.imread(str(img))
-            if bgr is None:
-                raise FileNotFoundError(f"无法读取图像: {img}")
-            return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            return cv2.cvtColor(Yolov8Inference._load_image_bgr(img), cv2.COLOR_BGR2RGB)
         elif isinstance(img, np.ndarray):
             if img.ndim == 2:
                 img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
@@ -48,9 +57,9 @@ class Yolov8Inference:
         else:
             raise TypeError("img 必须是路径或 numpy 数组")
 
-    def _predict(self, bgr: np.ndarray):
+    def _predict(self, source: np.ndarray | list[np.ndarray]):
         return self.model.predict(
-            source=bgr,
+            source=source,
             imgsz=self.imgsz,
             conf=self.conf,
             iou=self.iou,
@@ -61,92 +70,216 @@ class Yolov8Inference:
             verbose=False,
         )
 
-    def predict_image(
-        self, img: str | Path | np.ndarray, annotate: bool = True
+    def _to_detections(self, r) -> DetectionResult:
+        if r.boxes is None:
+            return DetectionResult.empty(self.names)
+        return DetectionResult.from_tensor(r.boxes.data, self.names)
+
+    def _prepare(
+        self, img: str | Path | np.ndarray, bgr: bool
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return `(image, model_input)`: the image in the caller's channel order
+        and the BGR array the model reads, converting at most once.
+        """
+        if isinstance(img, (str, Path)):
+            model_input = self._load_image_bgr(img)
+            image = model_input if bgr else cv2.cvtColor(model_input, cv2.COLOR_BGR2RGB)
+        elif bgr:
+            image = model_input = img
+        else:
+            image = self._load_image_rgb(img)
+            model_input = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        return image, model_input
+
+    def _output(
+        self, image: np.ndarray, r, annotate: bool, bgr: bool
     ) -> dict[str, Any]:
-        rgb = self._load_image_rgb(img)
-        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        results = self._predict(bgr)
-        r = results[0]
-        detections: list[dict[str, Any]] = []
-        for i in range(len(r.boxes)):
-            b = r.boxes[i]
-            xyxy = b.xyxy[0].cpu().numpy().astype(int).tolist()
-            conf = float(b.conf[0])
-            cls_id = int(b.cls[0])
-            name = (
-                self.names.get(cls_id, str(cls_id))
-                if isinstance(self.names, dict)
-                else self.names[cls_id]
-            )
-            detections.append({"xyxy": xyxy, "conf": conf, "cls": cls_id, "name": name})
-
-        annotated_rgb = None
+        annotated = None
         if annotate:
-            anno_bgr = r.plot()
-            annotated_rgb = cv2.cvtColor(anno_bgr, cv2.COLOR_BGR2RGB)
+            annotated = r.plot()
+            if not bgr:
+                annotated = cv2.cvtColor(annotated, cv2.COLOR_BGR2RGB)
+        return {
+            "image": image,
+            "annotated": annotated,
+            "detections": self._to_detections(r),
+        }
+
+    def predict_image(
+        self, img: str | Path | np.ndarray, annotate: bool = True, bgr: bool = False
+    ) -> dict[str, Any]:
+        """
+        Detect on one image; returns `image`, `annotated` and `detections`.
 
-        return {"image": rgb, "annotated": annotated_rgb, "detections": detections}
+        By default arrays are RGB and `image`/`annotated` are RGB. With `bgr`,
+        arrays are taken as BGR (as decoded by OpenCV) and both outputs stay
+        BGR, which avoids all colour conversions.
+        """
+        image, model_input = self._prepare(img, bgr)
+        r = self._predict(model_input)[0]
+        return self._output(image, r, annotate, bgr)
 
-    def predict_video(
+    def predict_batch(
+        self,
+        frames: list[str | Path | np.ndarray],
+        batch_size: int = 8,
+        annotate: bool = False,
+        bgr: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Run detection on several frames, `batch_size` frames per forward pass.
+
+        Returns one dict per input frame, in order, with the same keys as
+        `predict_image`: `image`, `annotated`, `detections`. `bgr` has the
+        same meaning as in `predict_image`.
+        """
+        batch_size = max(1, int(batch_size))
+        outputs: list[dict[str, Any]] = []
+        for start in range(0, len(frames), batch_size):
+            prepared = [
+                self._prepare(f, bgr) for f in frames[start : start + batch_size]
+            ]
+            results = self._predict([model_input for _, model_input in prepared])
+            for (image, _), r in zip(prepared, results, strict=True):
+                outputs.append(self._output(image, r, annotate, bgr))
+        return outputs
+
+    def _iter_video_outputs(
         self,
         video_path: str | Path,
-        max_frames: int | None = None,
-        sample_stride: int = 1,
-        annotate: bool = True,
-    ) -> dict[str, Any]:
+        max_frames: int | None,
+        sample_stride: int,
+        annotate: bool,
+        batch_size: int,
+        bgr: bool,
+        keep_image: bool = True,
+    ) -> Iterator[tuple[int, dict[str, Any]]]:
+        # Decoded frames are BGR and go to the model as they are; only the
+        # outputs the caller reads are converted when it wants RGB.
         cap = cv2.VideoCapture(str(video_path))
         if not cap.isOpened():
             raise FileNotFoundError(f"无法打开视频: {video_path}")
 
+        sample_stride = max(1, int(sample_stride))
+        batch_size = max(1, int(batch_size))
         frame_idx = 0
-        frames: list[np.ndarray] = []
-        annos: list[np.ndarray] = []
-        per_frame: list[list[dict[str, Any]]] = []
+        emitted = 0
+        pending_idx: list[int] = []
+        pending: list[np.ndarray] = []
+
+        def flush():
+            outs = self.predict_batch(pending, batch_size, annotate=annotate, bgr=True)
+            for out in outs:
+                if not keep_image:
+                    out["image"] = None
+                elif not bgr:
+                    out["image"] = cv2.cvtColor(out["image"], cv2.COLOR_BGR2RGB)
+                if not bgr and out["annotated"] is not None:
+                    out["annotated"] = cv2.cvtColor(out["annotated"], cv2.COLOR_BGR2RGB)
+            return zip(pending_idx, outs, strict=True)
 
-        while True:
-            ret, bgr = cap.read()
-            if not ret:
-                break
-            if frame_idx % sample_stride != 0:
+        try:
+            while max_frames is None or emitted + len(pending) < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_idx % sample_stride == 0:
+                    pending_idx.append(frame_idx)
+                    pending.append(frame)
                 frame_idx += 1
-                continue
-
-            results = self._predict(bgr)
-            r = results[0]
-            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-
-            detections: list[dict[str, Any]] = []
-            for i in range(len(r.boxes)):
-                b = r.boxes[i]
-                xyxy = b.xyxy[0].cpu().numpy().astype(int).tolist()
-                conf = float(b.conf[0])
-                cls_id = int(b.cls[0])
-                name = (
-                    self.names.get(cls_id, str(cls_id))
-                    if isinstance(self.names, dict)
-                    else self.names[cls_id]
-                )
-                detections.append(
-                    {"xyxy": xyxy, "conf": conf, "cls": cls_id, "name": name}
-                )
-
-            im_anno = None
-            if annotate:
-                anno_bgr = r.plot()
-                im_anno = cv2.cvtColor(anno_bgr, cv2.COLOR_BGR2RGB)
+                if len(pending) >= batch_size:
+                    yield from flush()
+                    emitted += len(pending)
+                    pending_idx, pending = [], []
+            if pending:
+                yield from flush()
+        finally:
+            cap.release()
+
+    def iter_video_results(
+        self,
+        video_path: str | Path,
+        max_frames: int | None = None,
+        sample_stride: int = 1,
+        annotate: bool = False,
+        batch_size: int = 8,
+        bgr: bool = False,
+    ) -> Iterator[tuple[int, dict[str, Any]]]:
+        """
+        Like `iter_video`, but yields `(frame_idx, out)` where `out` has the
+        `predict_image` keys, including the decoded `image`. Outputs are RGB,
+        or the decoder's BGR with `bgr`.
+        """
+        yield from self._iter_video_outputs(
+            video_path, max_frames, sample_stride, annotate, batch_size, bgr
+        )
+
+    def iter_video(
+        self,
+        video_path: str | Path,
+        max_frames: int | None = None,
+        sample_stride: int = 1,
+        annotate: bool = False,
+        batch_size: int = 8,
+        bgr: bool = False,
+    ) -> Iterator[tuple[int, DetectionResult, np.ndarray | None]]:
+        """
+        Stream detections frame by frame without retaining anything.
 
-            frames.append(rgb)
-            annos.append(im_anno)
-            per_frame.append(detections)
+        Yields `(frame_idx, detections, annotated)` where `frame_idx` is the
+        index of the decoded frame in the video and `annotated` is an RGB
+        (BGR with `bgr`) array when `annotate` is set, otherwise None. At most
+        `batch_size` frames are held in memory at any time.
+        """
+        for frame_idx, out in self._iter_video_outputs(
+            video_path,
+            max_frames,
+            sample_stride,
+            annotate,
+            batch_size,
+            bgr,
+            keep_image=False,
+        ):
+            yield frame_idx, out["detections"], out["annotated"]
 
-            frame_idx += 1
-            if max_frames is not None and len(frames) >= max_frames:
-                break
+    def predict_video(
+        self,
+        video_path: str | Path,
+        max_frames: int | None = None,
+        sample_stride: int = 1,
+        annotate: bool = True,
+        batch_size: int = 8,
+        keep_frames: bool = True,
+        bgr: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Collect per-frame results for a whole video.
+
+        Set `keep_frames=False` to drop the decoded frames (`frames` is then
+        None); use `iter_video` for long videos. Frames and annotations are
+        RGB, or BGR with `bgr`.
+        """
+        frames: list[np.ndarray] = []
+        annos: list[np.ndarray] = []
+        per_frame: list[DetectionResult] = []
+        for _, out in self._iter_video_outputs(
+            video_path,
+            max_frames,
+            sample_stride,
+            annotate,
+            batch_size,
+            bgr,
+            keep_image=keep_frames,
+        ):
+            if keep_frames:
+                frames.append(out["image"])
+            if annotate:
+                annos.append(out["annotated"])
+            per_frame.append(out["detections"])
 
-        cap.release()
         return {
-            "frames": frames,
+            "frames": frames if keep_frames else None,
             "annotated_frames": annos if annotate else None,
             "per_frame_detections": per_frame,
         }
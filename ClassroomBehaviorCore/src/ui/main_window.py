@@ -1,17 +1,83 @@
+import threading
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import cv2
 import numpy as np
 import yaml
 from analytics.head_rate import HeadUpRateAnalyzer
+from analytics.tracker import IoUTracker
 from PySide6 import QtCore, QtGui, QtWidgets
-from services.yolov8_inference import Yolov8Inference
+from services.detections import DetectionResult, draw_detections
+from services.frame_pipeline import (
+    AdaptiveScheduler,
+    BufferPool,
+    FrameQueue,
+    StageLatency,
+)
+from services.model_registry import registry
+
+if TYPE_CHECKING:  # pragma: no cover
+    # Imported lazily through the registry: ultralytics/torch load after the
+    # window is shown.
+    from services.yolov8_inference import Yolov8Inference
 
 
 def rgb_to_qimage(rgb: np.ndarray) -> QtGui.QImage:
+    """Copy an RGB array into a QImage that owns its pixels."""
     h, w, ch = rgb.shape
     bytes_per_line = ch * w
-    return QtGui.QImage(rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
+    return QtGui.QImage(
+        rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888
+    ).copy()
+
+
+def bgr_to_qimage(bgr: np.ndarray) -> QtGui.QImage:
+    """Copy a BGR array into a QImage that owns its pixels."""
+    bgr = np.ascontiguousarray(bgr)
+    h, w, ch = bgr.shape
+    return QtGui.QImage(bgr.data, w, h, ch * w, QtGui.QImage.Format_BGR888).copy()
+
+
+class FrameScaler:
+    """
+    Scales BGR frames straight into a ring of preallocated QImages.
+
+    `cv2.resize` writes into the QImage's own pixel buffer, so the frame is
+    converted to a display-sized QImage with a single pass and no colour
+    conversion; the GUI thread only uploads it. The ring is reallocated when
+    the target size changes.
+    """
+
+    def __init__(self, slots: int = 3) -> None:
+        self.slots = max(1, int(slots))
+        self._ring: list[QtGui.QImage] = []
+        self._size: tuple[int, int] | None = None
+        self._next = 0
+
+    def scale(self, bgr: np.ndarray, size: tuple[int, int]) -> QtGui.QImage:
+        h, w = bgr.shape[:2]
+        ratio = min(size[0] / w, size[1] / h)
+        dw, dh = max(1, round(w * ratio)), max(1, round(h * ratio))
+        if self._size != (dw, dh):
+            self._ring = [
+                QtGui.QImage(dw, dh, QtGui.QImage.Format_BGR888)
+                for _ in range(self.slots)
+            ]
+            self._size = (dw, dh)
+        qimg = self._ring[self._next]
+        self._next = (self._next + 1) % self.slots
+        # bits() detaches the image first if the GUI still holds this slot.
+        view = np.ndarray(
+            (dh, dw, 3),
+            dtype=np.uint8,
+            buffer=qimg.bits(),
+            strides=(qimg.bytesPerLine(), 3, 1),
+        )
+        interp = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+        cv2.resize(bgr, (dw, dh), dst=view, interpolation=interp)
+        return qimg
 
 
 class DropArea(QtWidgets.QLabel):
@@ -49,7 +115,7 @@ class ImageWorker(QtCore.QThread):
     finished = QtCore.Signal()
 
     def __init__(
-        self, infer: Yolov8Inference, analyzer: HeadUpRateAnalyzer, image_path: str
+        self, infer: "Yolov8Inference", analyzer: HeadUpRateAnalyzer, image_path: str
     ) -> None:
         super().__init__()
         self.infer = infer
@@ -58,11 +124,11 @@ class ImageWorker(QtCore.QThread):
 
     def run(self) -> None:
         try:
-            out = self.infer.predict_image(self.image_path, annotate=True)
+            out = self.infer.predict_image(self.image_path, annotate=True, bgr=True)
             qimg = (
-                rgb_to_qimage(out["annotated"])
+                bgr_to_qimage(out["annotated"])
                 if out.get("annotated") is not None
-                else rgb_to_qimage(out["image"])
+                else bgr_to_qimage(out["image"])
             )
             metrics = self.analyzer.analyze_frame(out["image"], out["detections"])
             metrics["frame"] = 0
@@ -73,54 +139,179 @@ class ImageWorker(QtCore.QThread):
 
 
 class VideoWorker(QtCore.QThread):
+    """
+    Three-stage video pipeline: decode -> inference -> render.
+
+    A reader thread decodes frames, this thread runs detection and analytics,
+    and a render thread draws boxes and builds the QImage. Stages are joined
+    by bounded `FrameQueue`s; with `drop_oldest` (default for live cameras and
+    streams) a slow stage skips to the newest frame instead of falling behind.
+
+    Frames stay BGR from decode to display: they are decoded into buffers
+    from a `BufferPool`, returned only once the frame is dropped or replaced
+    as `last_frame`, and the render stage scales them to `display_size` with
+    a `FrameScaler`. `last_frame` is the latest annotated full-size frame.
+
+    With `target_fps`, an `AdaptiveScheduler` runs detection only on some
+    frames; the others reuse the last detections shifted by the tracker's
+    velocities, so analytics still run on every displayed frame.
+    """
+
     frame_ready = QtCore.Signal(QtGui.QImage)
     metrics_ready = QtCore.Signal(dict)
+    stats_ready = QtCore.Signal(dict)
     finished = QtCore.Signal()
 
     def __init__(
         self,
-        infer: Yolov8Inference,
+        infer: "Yolov8Inference",
         analyzer: HeadUpRateAnalyzer,
         source: str,
         sample_stride: int = 1,
+        queue_size: int = 2,
+        drop_oldest: bool | None = None,
+        stats_interval: float = 0.5,
+        target_fps: float | None = None,
+        max_stride: int = 8,
+        display_size: tuple[int, int] = (1280, 720),
     ) -> None:
         super().__init__()
         self.infer = infer
         self.analyzer = analyzer
         self.source = source
         self.sample_stride = max(1, int(sample_stride))
+        if drop_oldest is None:
+            drop_oldest = self.is_live_source(source)
+        self.drop_oldest = drop_oldest
+        self.stats_interval = stats_interval
+        self.latency = StageLatency()
+        # Decode buffers come back when a frame is dropped or no longer shown.
+        self._buffers = BufferPool(2 * queue_size + 4)
+        self._frames = FrameQueue(
+            queue_size, drop_oldest, on_drop=lambda item: self._buffers.release(item[1])
+        )
+        self._rendered = FrameQueue(
+            queue_size, drop_oldest, on_drop=lambda item: self._buffers.release(item[0])
+        )
+        self.scheduler = (
+            AdaptiveScheduler(target_fps, max_stride) if target_fps else None
+        )
+        self._tracker = IoUTracker()
+        self.display_size = display_size
+        self.last_frame: np.ndarray | None = None
+        self._last_lock = threading.Lock()
+        self._scaler = FrameScaler()
         self._running = True
-        self._frame_id = 0
+
+    @staticmethod
+    def is_live_source(source: str) -> bool:
+        """Camera indices and network streams; files are not live."""
+        return str(source).isdigit() or "://" in str(source)
 
     def stop(self) -> None:
         self._running = False
+        self._frames.close(discard=True)
+        self._rendered.close(discard=True)
 
     def run(self) -> None:
-        cap = cv2.VideoCapture(self.source)
+        src = int(self.source) if str(self.source).isdigit() else self.source
+        cap = cv2.VideoCapture(src)
         if not cap.isOpened():
             self.finished.emit()
             return
-        while self._running:
-            ret, bgr = cap.read()
-            if not ret:
-                break
-            if self._frame_id % self.sample_stride != 0:
-                self._frame_id += 1
-                continue
-            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-            out = self.infer.predict_image(rgb, annotate=True)
-            qimg = (
-                rgb_to_qimage(out["annotated"])
-                if out.get("annotated") is not None
-                else rgb_to_qimage(out["image"])
+        reader = threading.Thread(target=self._read_loop, args=(cap,), daemon=True)
+        render = threading.Thread(target=self._render_loop, daemon=True)
+        reader.start()
+        render.start()
+        try:
+            self._infer_loop()
+        finally:
+            self._frames.close(discard=True)
+            self._rendered.close()
+            reader.join()
+            render.join()
+            cap.release()
+            self.finished.emit()
+
+    def snapshot_frame(self) -> np.ndarray | None:
+        """Copy of `last_frame`, taken before its buffer can be reused."""
+        with self._last_lock:
+            return None if self.last_frame is None else self.last_frame.copy()
+
+    def set_display_size(self, width: int, height: int) -> None:
+        self.display_size = (max(1, width), max(1, height))
+
+    def _read_loop(self, cap: cv2.VideoCapture) -> None:
+        frame_id = 0
+        try:
+            while self._running:
+                t0 = time.perf_counter()
+                if frame_id % self.sample_stride != 0:
+                    if not cap.grab():
+                        break
+                    frame_id += 1
+                    continue
+                ret, bgr = cap.read(self._buffers.acquire())
+                if not ret:
+                    break
+                self.latency.since("decode", t0)
+                if not self._frames.put((frame_id, bgr)):
+                    break
+                frame_id += 1
+        finally:
+            self._frames.close()
+
+    def _infer_loop(self) -> None:
+        last: DetectionResult | None = None
+        last_ids = np.zeros(0, dtype=np.int64)
+        last_frame = 0
+        while (item := self._frames.get()) is not None:
+            frame_id, bgr = item
+            t0 = time.perf_counter()
+            detect = (
+                last is None or self.scheduler is None or self.scheduler.should_infer()
             )
-            metrics = self.analyzer.analyze_frame(out["image"], out["detections"])
-            metrics["frame"] = self._frame_id
+            if detect:
+                out = self.infer.predict_image(bgr, annotate=False, bgr=True)
+                last = out["detections"]
+                if self.scheduler is not None:
+                    last_ids = self._tracker.update(last.boxes, frame_id - last_frame)
+                last_frame = frame_id
+                detections = last
+            else:
+                shift = self._tracker.velocities(last_ids) * (frame_id - last_frame)
+                detections = DetectionResult(
+                    np.rint(last.boxes + shift), last.confs, last.cls_ids, last.names
+                )
+            # The V channel used for head brightness is order-independent.
+            metrics = self.analyzer.analyze_frame(bgr, detections)
+            metrics["frame"] = frame_id
+            now = self.latency.since("infer" if detect else "reuse", t0)
+            if self.scheduler is not None:
+                self.scheduler.record(now - t0, detect)
+            if not self._rendered.put((bgr, detections, metrics)):
+                break
+
+    def _render_loop(self) -> None:
+        last_stats = 0.0
+        while (item := self._rendered.get()) is not None:
+            bgr, detections, metrics = item
+            t0 = time.perf_counter()
+            annotated = draw_detections(bgr, detections)
+            with self._last_lock:
+                previous, self.last_frame = self.last_frame, annotated
+            self._buffers.release(previous)
+            qimg = self._scaler.scale(annotated, self.display_size)
+            now = self.latency.since("render", t0)
             self.frame_ready.emit(qimg)
             self.metrics_ready.emit(metrics)
-            self._frame_id += 1
-        cap.release()
-        self.finished.emit()
+            if now - last_stats >= self.stats_interval:
+                last_stats = now
+                stats = self.latency.snapshot()
+                stats["dropped"] = self._frames.dropped + self._rendered.dropped
+                if self.scheduler is not None:
+                    stats["stride"] = self.scheduler.stride
+                self.stats_ready.emit(stats)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -139,6 +330,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self._build_ui()
         self._apply_style()
         self.statusBar().showMessage("就绪：上传图片或视频以开始推理")
+        # Load the default model in the background once the window is up.
+        QtCore.QTimer.singleShot(0, self._warmup_model)
 
     def _load_config(self) -> dict:
         cfg_path = self.app_root / "configs" / "config.yaml"
@@ -334,13 +527,31 @@ class MainWindow(QtWidgets.QMainWindow):
         if path:
             self.edit_weights.setText(path)
 
-    def _build_infer(self) -> Yolov8Inference:
+    def _model_key(self) -> dict:
+        inf_cfg = (self.config or {}).get("inference", {}) or {}
+        return {
+            "weights": self.edit_weights.text().strip() or "yolov8n.pt",
+            "device": str(inf_cfg.get("device", "")),
+            "half": bool(inf_cfg.get("half", False)),
+        }
+
+    def _warmup_model(self) -> None:
+        key = self._model_key()
+
+        def load() -> None:
+            try:
+                registry.get(**key)
+            except Exception:
+                # Reported by the first real inference instead.
+                pass
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def _build_infer(self) -> "Yolov8Inference":
+        # The registry reuses the loaded model; only conf/iou/etc. change here.
         classes = [0] if self.chk_person_only.isChecked() else None
-        return Yolov8Inference(
-            weights=self.edit_weights.text().strip() or "yolov8n.pt",
-            device=str(
-                ((self.config or {}).get("inference", {}) or {}).get("device", "")
-            ),
+        return registry.get(
+            **self._model_key(),
             imgsz=int(self.spn_imgsz.value()),
             conf=float(self.sld_conf.value()) / 100.0,
             iou=float(self.sld_iou.value()) / 100.0,
@@ -348,9 +559,6 @@ class MainWindow(QtWidgets.QMainWindow):
             max_det=int(
                 ((self.config or {}).get("inference", {}) or {}).get("max_det", 1000)
             ),
-            half=bool(
-                ((self.config or {}).get("inference", {}) or {}).get("half", False)
-            ),
         )
 
     def _build_analyzer(self) -> HeadUpRateAnalyzer:
@@ -359,6 +567,8 @@ class MainWindow(QtWidgets.QMainWindow):
             window_size=int(a_cfg.get("window_size", 15)),
             head_region_ratio=float(a_cfg.get("head_region_ratio", 0.2)),
             brightness_threshold=float(a_cfg.get("brightness_threshold", 0.35)),
+            use_integral=bool(a_cfg.get("integral_image", False)),
+            smoothing=str(a_cfg.get("smoothing", "window")),
         )
 
     def _on_drop_file(self, path: str) -> None:
@@ -404,6 +614,7 @@ class MainWindow(QtWidgets.QMainWindow):
             self._on_upload_video()
 
     def _run_image(self, path: str) -> None:
+        self._stop_worker()
         self._rows = []
         infer = self._build_infer()
         analyzer = self._build_analyzer()
@@ -418,14 +629,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.statusBar().showMessage("图片推理中…")
 
     def _start_video(self, path: str) -> None:
+        self._stop_worker()
         self._last_video_path = path
         self._rows = []
         infer = self._build_infer()
         analyzer = self._build_analyzer()
         self._set_running(True)
-        self.worker = VideoWorker(infer, analyzer, path, sample_stride=1)
+        v_cfg = (self.config or {}).get("video", {}) or {}
+        policy = str(v_cfg.get("drop_policy", "auto"))
+        self.worker = VideoWorker(
+            infer,
+            analyzer,
+            path,
+            sample_stride=1,
+            queue_size=int(v_cfg.get("queue_size", 2)),
+            drop_oldest=None if policy == "auto" else policy == "drop_oldest",
+            target_fps=v_cfg.get("target_fps"),
+            max_stride=int(v_cfg.get("max_stride", 8)),
+            display_size=self._display_size(),
+        )
         self.worker.frame_ready.connect(self._update_frame)
         self.worker.metrics_ready.connect(self._update_metrics)
+        self.worker.stats_ready.connect(self._update_pipeline_stats)
         self.worker.finished.connect(
             lambda: self.statusBar().showMessage("视频推理完成")
         )
@@ -436,25 +661,57 @@ class MainWindow(QtWidgets.QMainWindow):
         self.act_start_video.setEnabled(not running)
         self.act_stop.setEnabled(running)
 
+    def _display_size(self) -> tuple[int, int]:
+        size = self.display_label.size()
+        return size.width(), size.height()
+
+    def resizeEvent(self, event: QtGui.QResizeEvent) -> None:
+        super().resizeEvent(event)
+        if isinstance(self.worker, VideoWorker):
+            self.worker.set_display_size(*self._display_size())
+
+    def _full_res_annotated(self) -> QtGui.QImage | None:
+        # Video frames are shown pre-scaled; save the worker's full-size frame.
+        frame = (
+            self.worker.snapshot_frame()
+            if isinstance(self.worker, VideoWorker)
+            else None
+        )
+        if frame is not None:
+            return bgr_to_qimage(frame)
+        return self._last_annotated
+
+    def _stop_worker(self) -> bool:
+        """
+        Stop the running worker and wait for it; returns False if none ran.
+
+        Workers share the registry's cached model, whose predictor keeps the
+        last call's conf/iou/classes, so two must never run at once.
+        """
+        if not self.worker:
+            return False
+        if hasattr(self.worker, "stop"):
+            self.worker.stop()  # type: ignore
+        self.worker.wait()
+        self._last_annotated = self._full_res_annotated()
+        self.worker = None
+        return True
+
     def _on_stop(self) -> None:
-        if self.worker:
-            if hasattr(self.worker, "stop"):
-                self.worker.stop()  # type: ignore
-            self.worker.wait()
-            self.worker = None
+        if self._stop_worker():
             self.statusBar().showMessage("已停止")
             self._set_running(False)
 
     def _update_frame(self, qimg: QtGui.QImage) -> None:
         self._last_annotated = qimg
         pix = QtGui.QPixmap.fromImage(qimg)
-        self.display_label.setPixmap(
-            pix.scaled(
-                self.display_label.size(),
-                QtCore.Qt.KeepAspectRatio,
-                QtCore.Qt.SmoothTransformation,
+        target = pix.size().scaled(self.display_label.size(), QtCore.Qt.KeepAspectRatio)
+        if pix.size() != target:
+            # Video frames arrive already scaled by the worker.
+            pix = pix.scaled(
+                target, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation
             )
-        )
+        self.display_label.setPixmap(pix)
 
     def _update_metrics(self, m: dict) -> None:
         self.lbl_persons.setText(str(m.get("persons", 0)))
@@ -464,8 +721,17 @@ class MainWindow(QtWidgets.QMainWindow):
         self.lbl_rate_s.setText(f"{float(m.get('head_up_rate_smooth', 0.0)):.2f}")
         self._rows.append(m)
 
+    def _update_pipeline_stats(self, s: dict) -> None:
+        self.statusBar().showMessage(
+            f"视频推理中… 解码 {s.get('decode', 0.0):.1f} ms | "
+            f"推理 {s.get('infer', 0.0):.1f} ms | "
+            f"渲染 {s.get('render', 0.0):.1f} ms | 丢帧 {s.get('dropped', 0)}"
+            + (f" | 检测间隔 {s['stride']}" if "stride" in s else "")
+        )
+
     def _on_save_annotated(self) -> None:
-        if not self._last_annotated:
+        annotated = self._full_res_annotated()
+        if not annotated:
             QtWidgets.QMessageBox.information(self, "提示", "暂无标注图可保存")
             return
         out, _ = QtWidgets.QFileDialog.getSaveFileName(
@@ -475,7 +741,7 @@ class MainWindow(QtWidgets.QMainWindow):
             "PNG (*.png)",
         )
         if out:
-            self._last_annotated.save(out)
+            annotated.save(out)
             self.statusBar().showMessage(f"已保存: {out}")
 
     def _on_export_csv(self) -> None:
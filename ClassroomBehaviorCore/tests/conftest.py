@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Tests import the app as `src.*`, as `python -m src.<module>` does; make that
+# work regardless of the directory pytest is started from.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+from src.analytics.head_rate import HeadUpRateAnalyzer
+
+
+def random_boxes(rng: np.random.Generator, h: int, w: int, n: int) -> np.ndarray:
+    """Boxes inside, overlapping the edges of, and fully outside the frame."""
+    x1 = rng.integers(-w // 2, w + w // 2, n)
+    y1 = rng.integers(-h // 2, h + h // 2, n)
+    x2 = x1 + rng.integers(0, w, n)
+    y2 = y1 + rng.integers(0, h, n)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+class ClassifyHeadsTests(unittest.TestCase):
+    def setUp(self):
+        self.slice = HeadUpRateAnalyzer(use_integral=False)
+        self.integral = HeadUpRateAnalyzer(use_integral=True)
+
+    def assert_same_labels(self, img: np.ndarray, boxes: np.ndarray) -> None:
+        np.testing.assert_array_equal(
+            self.integral.classify_heads(img, boxes),
+            self.slice.classify_heads(img, boxes),
+        )
+
+    def test_integral_matches_slices(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            h, w = rng.integers(1, 160, 2)
+            img = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+            self.assert_same_labels(img, random_boxes(rng, h, w, rng.integers(0, 12)))
+
+    def test_grayscale_frames(self):
+        rng = np.random.default_rng(1)
+        img = rng.integers(0, 256, (90, 120), dtype=np.uint8)
+        self.assert_same_labels(img, random_boxes(rng, 90, 120, 20))
+
+    def test_no_usable_head_region(self):
+        img = np.zeros((100, 120, 3), dtype=np.uint8)
+        for boxes in (
+            np.zeros((0, 4), dtype=np.int64),
+            np.array([[200, 200, 250, 280]]),  # off-frame
+            np.array([[10, 10, 10, 50], [-40, -40, -5, -5]]),  # empty, off-frame
+        ):
+            for analyzer in (self.slice, self.integral):
+                labels = analyzer.classify_heads(img, boxes)
+                self.assertEqual(labels.tolist(), ["unknown"] * len(boxes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,14 +2,13 @@ import json
 import logging
 import os
 
-import pandas as pd
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from history_data.views import get_history_data
 
 # 获取项目根目录
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOGIN_FILE = os.path.join(BASE_DIR, "login.txt")
-DATA_FILE = os.path.join(BASE_DIR, "mydata.csv")
 logger = logging.getLogger("attendance")
 
 
@@ -158,149 +157,10 @@ def login(request):
 
 def history_data(request):
     """
-    处理历史数据查询请求，支持精确筛选和数值范围筛选
-    请求参数支持：
-    - 精确筛选：frame(帧号)、persons(人数)、head_up(抬头数)、head_down(低头数)
-    - 范围筛选：
-      - min_persons/max_persons：人数区间
-      - min_head_up/max_head_up：抬头数区间
-      - min_head_down/max_head_down：低头数区间
-      - min_rate/max_rate：抬头率区间（对应head_up_rate）
-      - min_rate_smooth/max_rate_smooth：平滑抬头率区间（对应head_up_rate_smooth）
-    返回格式：{
-        "code": 200,
-        "message": "success",
-        "data": {
-            "columns": ["frame", "persons", "head_up", "head_down", "head_up_rate", "head_up_rate_smooth"],
-            "rows": [记录列表...]
-        }
-    }
+    历史数据查询，与 `history_data.views.get_history_data` 相同（共用同一份
+    列式存储与筛选逻辑），参数与返回格式见该函数。
     """
-
-    try:
-        # 读取CSV数据（确保文件路径正确）
-        data_file = DATA_FILE
-        df = pd.read_csv(
-            data_file,
-            header=None,
-            names=[
-                "frame",
-                "persons",
-                "head_up",
-                "head_down",
-                "head_up_rate",
-                "head_up_rate_smooth",
-            ],
-            dtype=str,  # 先以字符串读取，后续按需转换为数值
-        )
-
-        # 1. 类型转换：将需要数值计算的字段转为float（避免字符串比较错误）
-        numeric_fields = [
-            "persons",
-            "head_up",
-            "head_down",
-            "head_up_rate",
-            "head_up_rate_smooth",
-        ]
-        for field in numeric_fields:
-            df[field] = pd.to_numeric(
-                df[field], errors="coerce"
-            )  # 转换失败的设为NaN（后续会被过滤）
-
-        # 2. 精确筛选：支持所有字段的精确匹配（如frame=1）
-        frame = request.GET.get("frame")
-        if frame:
-            df = df[df["frame"] == frame]
-
-        # 3. 范围筛选：
-        min_persons = request.GET.get("min_persons")
-        max_persons = request.GET.get("max_persons")
-        if min_persons:
-            try:
-                df = df[df["persons"] >= float(min_persons)]
-            except ValueError:
-                return JsonResponse(
-                    {
-                        "code": 400,
-                        "message": "min_persons格式错误，需为数值",
-                        "data": None,
-                    }
-                )
-        if max_persons:
-            try:
-                df = df[df["persons"] <= float(max_persons)]
-            except ValueError:
-                return JsonResponse(
-                    {
-                        "code": 400,
-                        "message": "max_persons格式错误，需为数值",
-                        "data": None,
-                    }
-                )
-
-        # 4. 范围筛选：抬头率（对应原需求的rate）
-        min_rate = request.GET.get("min_rate")
-        max_rate = request.GET.get("max_rate")
-        if min_rate:
-            try:
-                df = df[df["head_up_rate"] >= float(min_rate)]
-            except ValueError:
-                return JsonResponse(
-                    {"code": 400, "message": "min_rate格式错误，需为数值", "data": None}
-                )
-        if max_rate:
-            try:
-                df = df[df["head_up_rate"] <= float(max_rate)]
-            except ValueError:
-                return JsonResponse(
-                    {"code": 400, "message": "max_rate格式错误，需为数值", "data": None}
-                )
-
-        # 5. 扩展范围筛选：其他数值字段（可选）
-        min_head_up = request.GET.get("min_head_up")
-        max_head_up = request.GET.get("max_head_up")
-        if min_head_up:
-            df = df[df["head_up"] >= float(min_head_up)]
-        if max_head_up:
-            df = df[df["head_up"] <= float(max_head_up)]
-
-        min_head_down = request.GET.get("min_head_down")
-        max_head_down = request.GET.get("max_head_down")
-        if min_head_down:
-            df = df[df["head_down"] >= float(min_head_down)]
-        if max_head_down:
-            df = df[df["head_down"] <= float(max_head_down)]
-
-        min_rate_smooth = request.GET.get("min_rate_smooth")
-        max_rate_smooth = request.GET.get("max_rate_smooth")
-        if min_rate_smooth:
-            df = df[df["head_up_rate_smooth"] >= float(min_rate_smooth)]
-        if max_rate_smooth:
-            df = df[df["head_up_rate_smooth"] <= float(max_rate_smooth)]
-
-        # 过滤掉转换失败的NaN值
-        df = df.dropna()
-        # 格式
-        # df['rate'] = df['rate'].astype(str) + '%'
-        # df['date'] = df['date'].astype(str)  # 核心调整：日期对象转为字符串
-        result_data = df.to_dict("records")
-        # 构建返回结果
-        result = {
-            "code": 200,
-            "message": "success",
-            "data": {
-                "columns": result_data,
-                "total": len(df),  # 增加总记录数，方便前端分页
-            },
-        }
-        return JsonResponse(result)
-
-    except FileNotFoundError:
-        return JsonResponse({"code": 404, "message": "数据文件不存在", "data": None})
-    except Exception as e:
-        return JsonResponse(
-            {"code": 500, "message": f"服务器错误：{str(e)}", "data": None}
-        )
+    return get_history_data(request)
 
 
 def logout(request):
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+# 参与分桶统计的列
+STAT_COLUMNS = ["head_up_rate", "persons"]
+STAT_DECIMALS = 4
+# 汇总表的最小桶（帧）及汇总的列；25fps 下为 2 秒
+ROLLUP_FRAMES = 50
+ROLLUP_COLUMNS = ["persons", "head_up", "head_down", "head_up_rate"]
+# 汇总字段后缀 -> 合并同一桶时使用的归约（其余字段相加）
+ROLLUP_REDUCERS = {"sum": np.add, "min": np.minimum, "max": np.maximum}
+
+
+def bucket_stats(
+    df: pd.DataFrame, bucket_frames: int, percentile: float | None = None
+) -> pd.DataFrame:
+    """
+    按每 `bucket_frames` 帧分桶，统计各桶的 mean/min/max（及 p{percentile}）。
+
+    返回按 start_frame 升序的 DataFrame，列为 start_frame、count 以及
+    `{列名}_{mean|min|max|pNN}`；只包含有数据的桶。
+    """
+    key = (df["frame"].to_numpy() // bucket_frames) * bucket_frames
+    grouped = df[STAT_COLUMNS].groupby(key, sort=True)
+    stats = grouped.agg(["mean", "min", "max"])
+    stats.columns = [f"{col}_{stat}" for col, stat in stats.columns]
+
+    if percentile is not None:
+        label = f"p{percentile:g}"
+        quantiles = grouped.quantile(percentile / 100.0)
+        for col in STAT_COLUMNS:
+            stats[f"{col}_{label}"] = quantiles[col]
+
+    stats.insert(0, "count", grouped.size())
+    stats.index.name = "start_frame"
+    return stats.reset_index()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（含首尾点）。
+
+    点数不超过 `threshold` 时原样返回全部下标。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # 中间 n-2 个点均分为 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        nxt_stop = edges[i + 2] if i + 2 < len(edges) else n
+        # 下一个桶的均值点作为三角形的第三个顶点
+        cx = x[stop:nxt_stop].mean()
+        cy = y[stop:nxt_stop].mean()
+        area = np.abs(
+            (x[a] - cx) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (cy - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def to_records(stats: pd.DataFrame) -> list[dict]:
+    """统计结果转为记录列表：浮点保留 4 位小数，NaN 输出为 null。"""
+    stats = stats.round(STAT_DECIMALS).astype(object)
+    return stats.where(stats.notna(), None).to_dict("records")
+
+
+def _reduce_by_key(
+    keys: np.ndarray, fields: dict[str, np.ndarray]
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """把键相同的汇总行合并为一行：count/sum 相加，min/max 取极值。"""
+    if not len(keys):
+        return keys, fields
+    order = np.argsort(keys, kind="stable")
+    uniq, starts = np.unique(keys[order], return_index=True)
+    reduced = {}
+    for name, values in fields.items():
+        ufunc = ROLLUP_REDUCERS.get(name.rsplit("_", 1)[-1], np.add)
+        reduced[name] = ufunc.reduceat(np.asarray(values)[order], starts)
+    return uniq, reduced
+
+
+class Rollup:
+    """
+    每 `frames` 帧一个桶的可合并汇总：行数及各列的 sum/min/max。
+
+    数据导入时只对新增的行建汇总再与已有汇总合并；查询时把桶合并成
+    更粗的粒度即可得到统计，耗时只与桶数有关，不随原始行数增长。
+    """
+
+    def __init__(
+        self, frames: int, keys: np.ndarray, fields: dict[str, np.ndarray]
+    ) -> None:
+        self.frames = frames
+        self.keys = keys
+        self.fields = fields
+
+    @classmethod
+    def build(
+        cls, columns: dict[str, np.ndarray], frames: int = ROLLUP_FRAMES
+    ) -> "Rollup":
+        """由原始列建汇总。"""
+        keys = (np.asarray(columns["frame"]) // frames) * frames
+        fields = {"count": np.ones(len(keys), dtype=np.int64)}
+        for col in ROLLUP_COLUMNS:
+            for stat in ROLLUP_REDUCERS:
+                fields[f"{col}_{stat}"] = columns[col]
+        return cls(frames, *_reduce_by_key(keys, fields))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def merge(self, other: "Rollup") -> "Rollup":
+        """合并同粒度的另一份汇总（例如新追加行的汇总）。"""
+        if not len(other):
+            return self
+        keys = np.concatenate([self.keys, other.keys])
+        fields = {
+            name: np.concatenate([values, other.fields[name]])
+            for name, values in self.fields.items()
+        }
+        return Rollup(self.frames, *_reduce_by_key(keys, fields))
+
+    def coarsen(self, frames: int) -> "Rollup":
+        """合并为每 `frames` 帧一个桶；`frames` 需为当前粒度的整数倍。"""
+        if frames % self.frames:
+            raise ValueError(f"分桶大小需为{self.frames}的整数倍")
+        if frames == self.frames:
+            return self
+        keys = (self.keys // frames) * frames
+        return Rollup(frames, *_reduce_by_key(keys, self.fields))
+
+    def total(self) -> "Rollup":
+        """全部桶合并为一个，起始帧为最早的桶。"""
+        if not len(self):
+            return self
+        keys = np.full_like(self.keys, self.keys[0])
+        return Rollup(self.frames, *_reduce_by_key(keys, self.fields))
+
+    def stats(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """与 `bucket_stats`（不含百分位）同格式的各桶统计。"""
+        count = self.fields["count"]
+        stats = {"start_frame": self.keys, "count": count}
+        for col in columns or STAT_COLUMNS:
+            stats[f"{col}_mean"] = self.fields[f"{col}_sum"] / count
+            stats[f"{col}_min"] = self.fields[f"{col}_min"]
+            stats[f"{col}_max"] = self.fields[f"{col}_max"]
+        return pd.DataFrame(stats)
@@ -0,0 +1,382 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import ROLLUP_FRAMES, Rollup
+
+DATA_COLUMNS = [
+    "frame",
+    "persons",
+    "head_up",
+    "head_down",
+    "head_up_rate",
+    "head_up_rate_smooth",
+]
+# 建立排序索引的列：范围查询走二分查找
+INDEXED_COLUMNS = ["frame", "head_up_rate", "head_up_rate_smooth"]
+STORE_VERSION = 3
+# 用已解析部分开头和末尾各这么多字节的哈希判断文件是否只是被追加
+SIGNATURE_BYTES = 4096
+# 其他进程留下的版本目录超过这么久未修改才清理（可能仍在写入）
+STALE_SECONDS = 600
+
+logger = logging.getLogger("history_data")
+
+
+def _typed_column(values: pd.Series) -> np.ndarray:
+    """计数类列全为整数时存为 int64（JSON 输出保持整数），否则 float64。"""
+    arr = values.to_numpy(dtype=np.float64)
+    if len(arr) and np.array_equal(arr, np.round(arr)):
+        return arr.astype(np.int64)
+    return arr
+
+
+def parse_rows(data: bytes) -> dict[str, np.ndarray]:
+    """解析 CSV 字节（无表头），丢弃含无效数值的行，返回各列数组。"""
+    if not data.strip():
+        return {c: np.zeros(0, dtype=np.int64) for c in DATA_COLUMNS}
+    df = pd.read_csv(io.BytesIO(data), header=None, names=DATA_COLUMNS, dtype=str)
+    for field in DATA_COLUMNS:
+        df[field] = pd.to_numeric(df[field], errors="coerce")
+    df = df.dropna()
+    return {c: _typed_column(df[c]) for c in DATA_COLUMNS}
+
+
+def _concat(base: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """追加列数据；整数列追加的也是整数时保持 int64，否则整列转为 float64。"""
+    if base.dtype == new.dtype or not len(new):
+        return np.concatenate([base, new.astype(base.dtype, copy=False)])
+    if base.dtype == np.int64 and np.array_equal(new, np.round(new)):
+        return np.concatenate([base, new.astype(np.int64)])
+    return np.concatenate([base.astype(np.float64), new.astype(np.float64)])
+
+
+class HistoryTable:
+    """
+    某一版本数据的只读快照：各列数组、索引列的排序值/行号及按帧汇总
+    （`Rollup`）。
+
+    查询只读快照，追加数据时生成新快照再整体替换，并发请求不会读到
+    新旧混杂的列。
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, np.ndarray],
+        sorted_values: dict[str, np.ndarray] | None = None,
+        order: dict[str, np.ndarray] | None = None,
+        rollup: Rollup | None = None,
+    ) -> None:
+        self.columns = columns
+        if sorted_values is None or order is None:
+            order = {c: np.argsort(columns[c], kind="stable") for c in INDEXED_COLUMNS}
+            sorted_values = {c: columns[c][order[c]] for c in INDEXED_COLUMNS}
+        self.sorted = sorted_values
+        self.order = order
+        self.rollup = rollup if rollup is not None else Rollup.build(columns)
+        self._df: pd.DataFrame | None = None
+        self._df_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.columns["frame"])
+
+    def append(self, new: dict[str, np.ndarray]) -> "HistoryTable":
+        """
+        返回追加 `new` 行后的新快照；排序索引按归并方式插入，汇总只对
+        新行计算后合并，都无需重新处理已有行。
+        """
+        n_new = len(new["frame"])
+        if not n_new:
+            return self
+        base = len(self)
+        columns = {c: _concat(self.columns[c], new[c]) for c in DATA_COLUMNS}
+        sorted_values: dict[str, np.ndarray] = {}
+        order: dict[str, np.ndarray] = {}
+        for c in INDEXED_COLUMNS:
+            new_order = np.argsort(new[c], kind="stable")
+            new_sorted = columns[c][base:][new_order]
+            # side="right"：值相同时新行排在旧行之后，与整体稳定排序一致
+            pos = np.searchsorted(self.sorted[c], new_sorted, side="right")
+            sorted_values[c] = np.insert(
+                self.sorted[c].astype(columns[c].dtype, copy=False), pos, new_sorted
+            )
+            order[c] = np.insert(self.order[c], pos, new_order + base)
+        rollup = self.rollup.merge(Rollup.build(new))
+        return HistoryTable(columns, sorted_values, order, rollup)
+
+    def dataframe(self) -> pd.DataFrame:
+        """带类型的 DataFrame（首次调用时构建并缓存）。"""
+        with self._df_lock:
+            if self._df is None:
+                self._df = pd.DataFrame(
+                    {c: np.asarray(self.columns[c]) for c in DATA_COLUMNS}
+                )
+            return self._df
+
+    def select(
+        self, ranges: dict[str, tuple[float | None, float | None]]
+    ) -> np.ndarray:
+        """
+        返回满足所有区间条件（闭区间，None 表示不限）的行号，按原始行序。
+
+        先在索引列中选出候选行最少的区间（两次 searchsorted），再对候选
+        行检查其余条件。
+        """
+        candidates: dict[str, np.ndarray] = {}
+        for field, (lo, hi) in ranges.items():
+            if field in self.sorted:
+                values = self.sorted[field]
+                start = 0 if lo is None else np.searchsorted(values, lo, "left")
+                stop = (
+                    len(values) if hi is None else np.searchsorted(values, hi, "right")
+                )
+                candidates[field] = self.order[field][start:stop]
+        best = min(candidates, key=lambda f: len(candidates[f]), default=None)
+        rest = {f: r for f, r in ranges.items() if f != best}
+
+        rows = np.sort(candidates[best]) if best is not None else np.arange(len(self))
+        for field, (lo, hi) in rest.items():
+            col = self.columns[field][rows]
+            mask = np.ones(len(rows), dtype=bool)
+            if lo is not None:
+                mask &= col >= lo
+            if hi is not None:
+                mask &= col <= hi
+            rows = rows[mask]
+        return rows
+
+    def sort_rows(
+        self, rows: np.ndarray, field: str, descending: bool = False
+    ) -> np.ndarray:
+        """按 `field` 对行号排序（稳定排序，值相同保持原始行序）。"""
+        if not descending and field in self.order and len(rows) == len(self):
+            # 未筛选的升序查询直接使用排序索引
+            return np.asarray(self.order[field])
+        values = self.columns[field][rows]
+        return rows[np.argsort(-values if descending else values, kind="stable")]
+
+    def records(self, rows: np.ndarray, fields: list[str] | None = None) -> list[dict]:
+        """按行号取出记录（可只取 `fields` 列）；frame 保持原接口的字符串类型。"""
+        fields = fields or DATA_COLUMNS
+        values = {c: self.columns[c][rows].tolist() for c in fields}
+        if "frame" in values:
+            values["frame"] = [str(v) for v in values["frame"]]
+        return [
+            dict(zip(fields, row, strict=True))
+            for row in zip(*(values[c] for c in fields), strict=True)
+        ]
+
+
+class HistoryStore:
+    """
+    历史数据的共享加载器：进程内缓存 + 磁盘列式存储（每列一个 .npy）。
+
+    - `table()` 先比较 CSV 的 mtime/size，未变化时直接返回内存中的
+      `HistoryTable`，不做任何解析。
+    - 文件只被追加时（已解析部分首尾的哈希不变），从上次的字节偏移
+      开始只解析新增的完整行，并归并进排序索引和按帧汇总；否则整体
+      重新导入。
+      没有换行结尾的最后一行先临时解析，下次从它的起始偏移重新读取。
+    - 磁盘存储供新进程冷启动：每次写入新的版本子目录，最后替换
+      meta.json 指向它；追加的行超过 `persist_ratio` 时重新落盘。落盘
+      失败只记录日志，不影响查询。旧版本目录只清理本进程写入的，或
+      其他进程留下且超过 `STALE_SECONDS` 未修改的。
+    - 加锁保证多线程 WSGI 下同一时刻只有一个线程刷新。
+    """
+
+    def __init__(
+        self, csv_path: str, store_dir: str, persist_ratio: float = 0.1
+    ) -> None:
+        self.csv_path = csv_path
+        self.store_dir = store_dir
+        self.meta_path = os.path.join(store_dir, "meta.json")
+        self.persist_ratio = persist_ratio
+        self._lock = threading.Lock()
+        self._table: HistoryTable | None = None
+        # 不含临时解析的末尾行的快照，后续追加在它之上进行
+        self._base: HistoryTable | None = None
+        self._seen: tuple[int, int] | None = None  # (mtime_ns, size)
+        # 已解析到的字节偏移、对应的行数和首尾签名
+        self._offset = 0
+        self._committed = 0
+        self._signature = ""
+        self._persisted_rows = 0
+        # 本进程写入的版本目录，可随时清理
+        self._created: set[str] = set()
+
+    def _stat(self) -> tuple[int, int]:
+        st = os.stat(self.csv_path)  # 文件不存在时抛出 FileNotFoundError
+        return st.st_mtime_ns, st.st_size
+
+    def _signature_at(self, offset: int) -> str | None:
+        """前 offset 字节中开头与末尾各 SIGNATURE_BYTES 字节的哈希。"""
+        start = max(0, offset - SIGNATURE_BYTES)
+        with open(self.csv_path, "rb") as f:
+            head = f.read(min(offset, SIGNATURE_BYTES))
+            f.seek(start)
+            tail = f.read(offset - start)
+        if len(tail) != offset - start:
+            return None
+        return hashlib.sha1(head + tail).hexdigest()
+
+    def _read_meta(self) -> dict | None:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != STORE_VERSION:
+            return None
+        return meta if meta.get("rollup_frames") == ROLLUP_FRAMES else None
+
+    def _path(self, version_dir: str, name: str) -> str:
+        return os.path.join(self.store_dir, version_dir, f"{name}.npy")
+
+    def table(self) -> HistoryTable:
+        """当前数据的快照；CSV 变化后先刷新。"""
+        stat = self._stat()
+        with self._lock:
+            if self._table is None or stat != self._seen:
+                self._refresh(stat)
+            return self._table
+
+    def _refresh(self, stat: tuple[int, int]) -> None:
+        if self._table is None:
+            self._load_persisted()
+        if self._table is not None and self._is_append_only(stat[1]):
+            self._load_appended()
+        else:
+            self._ingest()
+        self._seen = stat
+
+    def _is_append_only(self, size: int) -> bool:
+        return size >= self._offset and self._signature_at(self._offset) == (
+            self._signature
+        )
+
+    def _read_from(self, offset: int) -> tuple[bytes, bytes]:
+        """读取 offset 之后的内容，拆成完整行部分与无换行结尾的末尾。"""
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        cut = data.rfind(b"\n") + 1
+        return data[:cut], data[cut:]
+
+    def _ingest(self) -> None:
+        complete, tail = self._read_from(0)
+        table = HistoryTable(parse_rows(complete))
+        self._commit(table, len(complete), tail)
+        self._persist()
+
+    def _load_appended(self) -> None:
+        complete, tail = self._read_from(self._offset)
+        table = self._base.append(parse_rows(complete))
+        self._commit(table, self._offset + len(complete), tail)
+        if len(table) - self._persisted_rows > self.persist_ratio * max(
+            self._persisted_rows, 1
+        ):
+            self._persist()
+
+    def _commit(self, table: HistoryTable, offset: int, tail: bytes) -> None:
+        self._offset = offset
+        self._committed = len(table)
+        self._base = table
+        self._signature = self._signature_at(offset) or ""
+        self._table = table.append(parse_rows(tail)) if tail.strip() else table
+
+    def _persist(self) -> None:
+        try:
+            self._write_version()
+        except (OSError, ValueError) as e:
+            # 内存中的数据仍然可用，下次追加时重试落盘
+            logger.warning(f"历史数据落盘失败: {e}")
+
+    def _write_version(self) -> None:
+        table = self._base
+        # 目录名不重复：不会覆盖其他进程可能正映射着的文件
+        version_dir = f"v{self._offset}_{os.getpid()}_{time.time_ns()}"
+        os.makedirs(os.path.join(self.store_dir, version_dir), exist_ok=True)
+        self._created.add(version_dir)
+        for c in DATA_COLUMNS:
+            np.save(self._path(version_dir, c), table.columns[c])
+        for c in INDEXED_COLUMNS:
+            np.save(self._path(version_dir, f"{c}.sorted"), table.sorted[c])
+            np.save(self._path(version_dir, f"{c}.order"), table.order[c])
+        np.save(self._path(version_dir, "rollup.keys"), table.rollup.keys)
+        for name, values in table.rollup.fields.items():
+            np.save(self._path(version_dir, f"rollup.{name}"), values)
+        # meta 最后写入：切换到新版本目录
+        meta = {
+            "version": STORE_VERSION,
+            "dir": version_dir,
+            "rollup_frames": table.rollup.frames,
+            "rollup_fields": list(table.rollup.fields),
+            "offset": self._offset,
+            "rows": self._committed,
+            "signature": self._signature,
+        }
+        tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+        self._persisted_rows = self._committed
+        self._remove_stale(version_dir)
+
+    def _load_persisted(self) -> None:
+        meta = self._read_meta()
+        if meta is None:
+            return
+        version_dir = meta["dir"]
+        try:
+            table = HistoryTable(
+                {
+                    c: np.load(self._path(version_dir, c), mmap_mode="r")
+                    for c in DATA_COLUMNS
+                },
+                {
+                    c: np.load(self._path(version_dir, f"{c}.sorted"), mmap_mode="r")
+                    for c in INDEXED_COLUMNS
+                },
+                {
+                    c: np.load(self._path(version_dir, f"{c}.order"), mmap_mode="r")
+                    for c in INDEXED_COLUMNS
+                },
+                Rollup(
+                    ROLLUP_FRAMES,
+                    np.load(self._path(version_dir, "rollup.keys")),
+                    {
+                        name: np.load(self._path(version_dir, f"rollup.{name}"))
+                        for name in meta["rollup_fields"]
+                    },
+                ),
+            )
+        except (OSError, ValueError):
+            # 另一进程刚切换版本并清理了旧目录：当作没有缓存
+            return
+        self._table = self._base = table
+        self._offset = int(meta["offset"])
+        self._committed = int(meta["rows"])
+        self._signature = meta["signature"]
+        self._persisted_rows = self._committed
+
+    def _remove_stale(self, keep: str) -> None:
+        meta = self._read_meta()
+        current = {keep, meta["dir"] if meta else keep}
+        expired = time.time() - STALE_SECONDS
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            if name in current or not os.path.isdir(path):
+                continue
+            # 其他进程的目录可能正在写入，只清理长时间未修改的
+            if name in self._created or os.path.getmtime(path) < expired:
+                # 其他进程可能仍映射着旧文件（Windows 上删除会失败），忽略即可
+                shutil.rmtree(path, ignore_errors=True)
+                self._created.discard(name)
@@ -1 +1,124 @@
-# Create your tests here.
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .aggregates import bucket_stats
+from .storage import DATA_COLUMNS, HistoryStore
+
+
+def make_rows(start: int, n: int, seed: int = 0) -> str:
+    """生成 n 行 CSV 文本（无表头），帧号从 start 开始。"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for frame in range(start, start + n):
+        persons = int(rng.integers(1, 40))
+        up = int(rng.integers(0, persons + 1))
+        lines.append(
+            f"{frame},{persons},{up},{persons - up},"
+            f"{up / persons:.4f},{rng.random():.4f}\n"
+        )
+    return "".join(lines)
+
+
+class HistoryStoreTests(SimpleTestCase):
+    """HistoryStore 的增量追加、重写检测、冷启动与汇总表需与整体重新解析一致。"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.csv = os.path.join(self.tmp, "mydata.csv")
+        self.store_dir = os.path.join(self.tmp, "store")
+        self.write(make_rows(0, 500), "w")
+        self.store = HistoryStore(self.csv, self.store_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, text: str, mode: str = "a") -> None:
+        with open(self.csv, mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def expected(self) -> pd.DataFrame:
+        df = pd.read_csv(self.csv, header=None, names=DATA_COLUMNS, dtype=str)
+        return df.apply(pd.to_numeric, errors="coerce").dropna()
+
+    def assert_matches_csv(self, store: HistoryStore) -> None:
+        table = store.table()
+        df = self.expected()
+        self.assertEqual(len(table), len(df))
+        for c in DATA_COLUMNS:
+            np.testing.assert_allclose(table.columns[c], df[c].to_numpy())
+
+        lo, hi = 0.3, 0.6
+        rows = table.select({"head_up_rate": (lo, hi)})
+        expected_rows = np.flatnonzero(df["head_up_rate"].between(lo, hi).to_numpy())
+        np.testing.assert_array_equal(rows, expected_rows)
+
+        for bucket in (50, 100, 1500):
+            pd.testing.assert_frame_equal(
+                table.rollup.coarsen(bucket).stats(),
+                bucket_stats(df, bucket),
+                check_dtype=False,
+            )
+
+    def test_initial_load(self):
+        self.assert_matches_csv(self.store)
+
+    def test_append_is_incremental(self):
+        self.store.table()
+        self.write(make_rows(500, 120, seed=1))
+        with mock.patch.object(self.store, "_ingest", side_effect=AssertionError):
+            self.assert_matches_csv(self.store)
+
+    def test_append_into_existing_buckets(self):
+        self.store.table()
+        # 帧号不递增：新行落入已有的汇总桶
+        self.write(make_rows(10, 30, seed=2) + make_rows(480, 40, seed=3))
+        self.assert_matches_csv(self.store)
+
+    def test_partial_last_line(self):
+        self.store.table()
+        self.write("500,7,7,0,1.0,0.")
+        self.assert_matches_csv(self.store)
+        self.write("9\n501,8,2,6,0.25,0.5\n")
+        self.assert_matches_csv(self.store)
+        self.assertEqual(self.store.table().columns["head_up_rate_smooth"][500], 0.9)
+
+    def test_invalid_rows_are_dropped(self):
+        self.store.table()
+        self.write("500,x,1,1,0.5,0.5\n501,4,1,3,0.25,0.3\n")
+        self.assert_matches_csv(self.store)
+
+    def test_rewrite_is_detected(self):
+        self.store.table()
+        # 内容变化但长度相同：末尾签名不同，需整体重新导入
+        with open(self.csv, encoding="utf-8") as f:
+            text = f.read()
+        self.write(text.replace("0,", "9,", 1), "w")
+        os.utime(self.csv, ns=(0, os.stat(self.csv).st_mtime_ns + 1))
+        self.assert_matches_csv(self.store)
+
+        self.write(make_rows(0, 200, seed=4), "w")
+        self.assert_matches_csv(self.store)
+
+    def test_cold_start_from_meta(self):
+        self.store.table()
+        self.write(make_rows(500, 50, seed=5))
+        self.store.table()
+        self.store._persist()
+
+        cold = HistoryStore(self.csv, self.store_dir)
+        with mock.patch.object(cold, "_ingest", side_effect=AssertionError):
+            self.assert_matches_csv(cold)
+            self.write(make_rows(550, 60, seed=6))
+            self.assert_matches_csv(cold)
+
+    def test_cold_start_after_rewrite(self):
+        self.store.table()
+        self.write(make_rows(0, 300, seed=7), "w")
+        cold = HistoryStore(self.csv, self.store_dir)
+        self.assert_matches_csv(cold)
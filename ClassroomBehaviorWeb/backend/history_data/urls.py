@@ -4,4 +4,6 @@ from . import views
 
 urlpatterns = [
     path("history/", views.get_history_data, name="history"),
+    path("history/aggregate/", views.get_history_aggregate, name="history_aggregate"),
+    path("history/summary/", views.get_history_summary, name="history_summary"),
 ]
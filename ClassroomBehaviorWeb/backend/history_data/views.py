@@ -1,149 +1,255 @@
+import json
 import os
 
-import pandas as pd
-from django.http import JsonResponse
+import numpy as np
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 
+from .aggregates import ROLLUP_COLUMNS, ROLLUP_FRAMES, bucket_stats, lttb, to_records
+from .storage import DATA_COLUMNS, HistoryStore, HistoryTable
+
 # 获取项目根目录
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOGIN_FILE = os.path.join(BASE_DIR, "login.txt")
 DATA_FILE = os.path.join(BASE_DIR, "mydata.csv")
-DATA_COLUMNS = [
-    "frame",
-    "persons",
-    "head_up",
-    "head_down",
-    "head_up_rate",
-    "head_up_rate_smooth",
-]
+STORE_DIR = os.path.join(BASE_DIR, "history_store")
+STORE = HistoryStore(DATA_FILE, STORE_DIR)
+
+# 按时间窗口分桶时，未指定 fps 则按该帧率把秒换算为帧
+DEFAULT_FPS = 25.0
+DEFAULT_BUCKET_FRAMES = 100
+
+# 范围筛选参数 -> (列名, 上/下界)
+RANGE_PARAMS = {
+    "min_persons": ("persons", 0),
+    "max_persons": ("persons", 1),
+    "min_head_up": ("head_up", 0),
+    "max_head_up": ("head_up", 1),
+    "min_head_down": ("head_down", 0),
+    "max_head_down": ("head_down", 1),
+    "min_rate": ("head_up_rate", 0),
+    "max_rate": ("head_up_rate", 1),
+    "min_rate_smooth": ("head_up_rate_smooth", 0),
+    "max_rate_smooth": ("head_up_rate_smooth", 1),
+}
+
+
+def parse_filters(params) -> dict[str, tuple[float | None, float | None]] | None:
+    """
+    将请求参数转换为 {列名: (下界, 上界)}。
+
+    参数不是数值时抛出 ValueError（消息可直接返回前端）；frame 不是数值时
+    不可能匹配任何记录，返回 None。
+    """
+    bounds: dict[str, list[float | None]] = {}
+    for param, (field, side) in RANGE_PARAMS.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        try:
+            value = float(raw)
+        except ValueError:
+            raise ValueError(f"{param}格式错误，需为数值") from None
+        bounds.setdefault(field, [None, None])[side] = value
+
+    frame = params.get("frame")
+    if frame:
+        try:
+            value = float(frame)
+        except ValueError:
+            return None
+        bounds["frame"] = [value, value]
+    return {field: (lo, hi) for field, (lo, hi) in bounds.items()}
+
+
+def parse_page(params) -> tuple[int, int | None, list[str], str | None, bool]:
+    """解析分页/投影/排序参数：offset、limit、fields、order_by（"-" 前缀为降序）。"""
+    try:
+        offset = int(params.get("offset") or 0)
+        limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError:
+        raise ValueError("offset/limit格式错误，需为整数") from None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset/limit不能为负数")
+
+    fields = [f.strip() for f in (params.get("fields") or "").split(",") if f.strip()]
+    unknown = [f for f in fields if f not in DATA_COLUMNS]
+    if unknown:
+        raise ValueError(f"fields包含未知字段：{','.join(unknown)}")
+
+    order_by = params.get("order_by") or None
+    descending = False
+    if order_by:
+        descending = order_by.startswith("-")
+        order_by = order_by.lstrip("-")
+        if order_by not in DATA_COLUMNS:
+            raise ValueError(f"order_by字段不存在：{order_by}")
+    return offset, limit, fields or DATA_COLUMNS, order_by, descending
+
+
+def stream_ndjson(table: HistoryTable, rows, fields: list[str], chunk_rows: int = 5000):
+    """逐块生成 NDJSON（每行一条记录），不在内存中拼出完整结果。"""
+    for start in range(0, len(rows), chunk_rows):
+        records = table.records(rows[start : start + chunk_rows], fields)
+        yield "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
 
 
 def get_history_data(request):
     """
     处理历史数据查询请求，支持精确筛选和数值范围筛选
     请求参数支持：
-    - 精确筛选：frame(帧号)、persons(人数)、head_up(抬头数)、head_down(低头数)
+    - 精确筛选：frame(帧号)
     - 范围筛选：
       - min_persons/max_persons：人数区间
       - min_head_up/max_head_up：抬头数区间
       - min_head_down/max_head_down：低头数区间
       - min_rate/max_rate：抬头率区间（对应head_up_rate）
       - min_rate_smooth/max_rate_smooth：平滑抬头率区间（对应head_up_rate_smooth）
+    - 分页与投影：
+      - offset/limit：跳过前 offset 条，最多返回 limit 条（不传 limit 返回全部）
+      - fields：逗号分隔的返回字段，默认全部
+      - order_by：排序字段，"-" 前缀为降序，默认按原始顺序
+      - format=ndjson：以 StreamingHttpResponse 逐块返回 NDJSON（每行一条
+        记录，总数在 X-Total-Count 响应头中），用于大范围导出
+    数据来自进程内共享的 `HistoryStore`：CSV 未变化时不再解析，追加的行
+    增量读取；frame 与抬头率列的范围筛选通过排序索引二分查找完成。
     返回格式：{
         "code": 200,
         "message": "success",
         "data": {
-            "columns": ["frame", "persons", "head_up", "head_down", "head_up_rate", "head_up_rate_smooth"],
-            "rows": [记录列表...]
+            "columns": [记录列表...],
+            "total": 筛选后的总记录数（分页前）,
+            "offset": offset,
+            "limit": limit
         }
     }
     """
 
     try:
-        # 读取数据
-        data_file = DATA_FILE
-        df = pd.read_csv(
-            data_file,
-            header=None,
-            names=DATA_COLUMNS,
-            dtype=str,  # 先以字符串读取，后续按需转换为数值
-        )
+        try:
+            ranges = parse_filters(request.GET)
+            offset, limit, fields, order_by, descending = parse_page(request.GET)
+        except ValueError as e:
+            return JsonResponse({"code": 400, "message": str(e), "data": None})
+
+        table = STORE.table()
+        rows = table.select(ranges) if ranges is not None else np.empty(0, dtype=int)
+        total = len(rows)
+        if order_by:
+            rows = table.sort_rows(rows, order_by, descending)
+        rows = rows[offset : None if limit is None else offset + limit]
+
+        if request.GET.get("format") == "ndjson":
+            response = StreamingHttpResponse(
+                stream_ndjson(table, rows, fields),
+                content_type="application/x-ndjson; charset=utf-8",
+            )
+            response["X-Total-Count"] = str(total)
+            return response
 
-        # 1. 类型转换：将需要数值计算的字段转为float（避免字符串比较错误）
-        numeric_fields = [
-            "persons",
-            "head_up",
-            "head_down",
-            "head_up_rate",
-            "head_up_rate_smooth",
-        ]
-        for field in numeric_fields:
-            df[field] = pd.to_numeric(df[field], errors="coerce")
-
-        # 2. 精确筛选：支持所有字段的精确匹配（如frame=1）
-        frame = request.GET.get("frame")
-        if frame:
-            df = df[df["frame"] == frame]
-
-        # 3. 范围筛选：
-        min_persons = request.GET.get("min_persons")
-        max_persons = request.GET.get("max_persons")
-        if min_persons:
-            try:
-                df = df[df["persons"] >= float(min_persons)]
-            except ValueError:
-                return JsonResponse(
-                    {
-                        "code": 400,
-                        "message": "min_persons格式错误，需为数值",
-                        "data": None,
-                    }
-                )
-        if max_persons:
-            try:
-                df = df[df["persons"] <= float(max_persons)]
-            except ValueError:
-                return JsonResponse(
-                    {
-                        "code": 400,
-                        "message": "max_persons格式错误，需为数值",
-                        "data": None,
-                    }
-                )
-
-        # 4. 范围筛选：抬头率（对应原需求的rate）
-        min_rate = request.GET.get("min_rate")
-        max_rate = request.GET.get("max_rate")
-        if min_rate:
-            try:
-                df = df[df["head_up_rate"] >= float(min_rate)]
-            except ValueError:
-                return JsonResponse(
-                    {"code": 400, "message": "min_rate格式错误，需为数值", "data": None}
-                )
-        if max_rate:
-            try:
-                df = df[df["head_up_rate"] <= float(max_rate)]
-            except ValueError:
-                return JsonResponse(
-                    {"code": 400, "message": "max_rate格式错误，需为数值", "data": None}
-                )
-
-        # 5. 扩展范围筛选：其他数值字段（可选）
-        min_head_up = request.GET.get("min_head_up")
-        max_head_up = request.GET.get("max_head_up")
-        if min_head_up:
-            df = df[df["head_up"] >= float(min_head_up)]
-        if max_head_up:
-            df = df[df["head_up"] <= float(max_head_up)]
-
-        min_head_down = request.GET.get("min_head_down")
-        max_head_down = request.GET.get("max_head_down")
-        if min_head_down:
-            df = df[df["head_down"] >= float(min_head_down)]
-        if max_head_down:
-            df = df[df["head_down"] <= float(max_head_down)]
-
-        min_rate_smooth = request.GET.get("min_rate_smooth")
-        max_rate_smooth = request.GET.get("max_rate_smooth")
-        if min_rate_smooth:
-            df = df[df["head_up_rate_smooth"] >= float(min_rate_smooth)]
-        if max_rate_smooth:
-            df = df[df["head_up_rate_smooth"] <= float(max_rate_smooth)]
-
-        # 过滤掉转换失败的NaN值
-        df = df.dropna()
-        # 格式
-        # df['rate'] = df['rate'].astype(str) + '%'
-        # df['date'] = df['date'].astype(str)  # 核心调整：日期对象转为字符串
-        result_data = df.to_dict("records")
         # 构建返回结果
         result = {
             "code": 200,
             "message": "success",
             "data": {
-                "columns": result_data,
-                "total": len(df),  # 增加总记录数，方便前端分页
+                "columns": table.records(rows, fields),
+                "total": total,  # 增加总记录数，方便前端分页
+                "offset": offset,
+                "limit": limit,
+            },
+        }
+        return JsonResponse(result)
+
+    except FileNotFoundError:
+        return JsonResponse({"code": 404, "message": "数据文件不存在", "data": None})
+    except Exception as e:
+        return JsonResponse(
+            {"code": 500, "message": f"服务器错误：{str(e)}", "data": None}
+        )
+
+
+def parse_bucket(params) -> tuple[int, float, float | None, int | None]:
+    """
+    解析聚合参数，返回 (每桶帧数, fps, 百分位, LTTB 点数)。
+
+    bucket 直接给出每桶帧数；window 给出每桶秒数，按 fps 换算为帧数。
+    """
+    try:
+        fps = float(params.get("fps") or DEFAULT_FPS)
+        percentile = float(params["percentile"]) if params.get("percentile") else None
+        if params.get("window"):
+            bucket = round(float(params["window"]) * fps)
+        else:
+            bucket = int(params.get("bucket") or DEFAULT_BUCKET_FRAMES)
+        points = int(params["points"]) if params.get("points") else None
+    except ValueError:
+        raise ValueError(
+            "bucket/window/fps/percentile/points格式错误，需为数值"
+        ) from None
+    if fps <= 0 or bucket <= 0:
+        raise ValueError("分桶大小与fps需为正数")
+    if percentile is not None and not 0 <= percentile <= 100:
+        raise ValueError("percentile需在0到100之间")
+    if points is not None and points < 3:
+        raise ValueError("points不能小于3")
+    return bucket, fps, percentile, points
+
+
+def get_history_aggregate(request):
+    """
+    按帧分桶返回抬头率与人数的统计，供前端绘制趋势图，无需下载全部原始行。
+
+    请求参数：
+    - bucket：每桶帧数（默认 100）；或 window：每桶秒数，配合 fps（默认 25）
+    - percentile：额外统计的百分位（如 90，对应 *_p90 字段），默认不统计
+    - points：用 LTTB 按 head_up_rate_mean 曲线降采样到至多这么多个桶
+    - 同 get_history_data 的范围筛选参数，先筛选再分桶
+    没有筛选条件、不统计百分位且桶大小是 ROLLUP_FRAMES 的整数倍时，
+    直接合并导入时维护的汇总表，不再扫描原始行；否则对筛选后的行分组统计。
+    返回格式：{
+        "code": 200,
+        "message": "success",
+        "data": {
+            "bucket_frames": 每桶帧数,
+            "buckets": [{"start_frame", "start_time", "count",
+                         "head_up_rate_mean/min/max/pNN",
+                         "persons_mean/min/max/pNN"}, ...],
+            "total": 降采样前的桶数
+        }
+    }
+    """
+    try:
+        try:
+            ranges = parse_filters(request.GET)
+            bucket, fps, percentile, points = parse_bucket(request.GET)
+        except ValueError as e:
+            return JsonResponse({"code": 400, "message": str(e), "data": None})
+
+        table = STORE.table()
+        if ranges == {} and percentile is None and bucket % ROLLUP_FRAMES == 0:
+            stats = table.rollup.coarsen(bucket).stats()
+        else:
+            rows = (
+                table.select(ranges) if ranges is not None else np.empty(0, dtype=int)
+            )
+            stats = bucket_stats(table.dataframe().iloc[rows], bucket, percentile)
+        total = len(stats)
+        if points is not None:
+            keep = lttb(
+                stats["start_frame"].to_numpy(),
+                stats["head_up_rate_mean"].to_numpy(),
+                points,
+            )
+            stats = stats.iloc[keep]
+        stats.insert(1, "start_time", stats["start_frame"] / fps)
+
+        result = {
+            "code": 200,
+            "message": "success",
+            "data": {
+                "bucket_frames": bucket,
+                "buckets": to_records(stats),
+                "total": total,
             },
         }
         return JsonResponse(result)
@@ -156,6 +262,37 @@ def get_history_data(request):
         )
 
 
+def get_history_summary(request):
+    """
+    返回全部历史数据的汇总（直接读取汇总表，耗时不随历史长度增长）。
+
+    返回格式：{
+        "code": 200,
+        "message": "success",
+        "data": {"start_frame", "count", "persons_mean/min/max",
+                 "head_up_mean/min/max", "head_down_mean/min/max",
+                 "head_up_rate_mean/min/max"}，没有数据时为 null
+    }
+    """
+    try:
+        stats = STORE.table().rollup.total().stats(ROLLUP_COLUMNS)
+        records = to_records(stats)
+        return JsonResponse(
+            {
+                "code": 200,
+                "message": "success",
+                "data": records[0] if records else None,
+            }
+        )
+
+    except FileNotFoundError:
+        return JsonResponse({"code": 404, "message": "数据文件不存在", "data": None})
+    except Exception as e:
+        return JsonResponse(
+            {"code": 500, "message": f"服务器错误：{str(e)}", "data": None}
+        )
+
+
 def logout(request):
     request.session.flush()
     return redirect("/login/")
@@ -167,6 +167,11 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,  # 不向上级日志器传递
         },
+        "history_data": {
+            "handlers": ["console", "file"],
+            "level": "INFO",
+            "propagate": False,
+        },
         # Django 自带日志器（可选）
         "django": {
             "handlers": ["console", "file"],